@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+"""
+Account Registry
+SQLite store of Git accounts, the repositories created for them and what
+each project was generated from, safe for concurrent writers, with
+migration from git-accounts.json and the ~/Developer/.git-accounts
+allowed-repositories file
+"""
+
+import bisect
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Next to the app rather than the current directory
+DEFAULT_CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "git-accounts.json")
+REGISTRY_FILENAME = "registry.db"
+ALLOWED_REPOS_FILENAME = ".git-accounts"
+
+DEFAULT_ACCOUNTS = {
+    "freyjay": {
+        "name": "freyjay",
+        "email": "francisrey@example.com",
+        "ssh_host": "github-personal",
+        "ssh_key": "~/.ssh/id_rsa_personal"
+    }
+}
+
+ACCOUNT_FIELDS = ("name", "email", "ssh_host", "ssh_key")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    key TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    ssh_host TEXT NOT NULL,
+    ssh_key TEXT NOT NULL,
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS repositories (
+    account TEXT NOT NULL,
+    repo TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (account, repo)
+);
+CREATE TABLE IF NOT EXISTS projects (
+    path TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    account TEXT NOT NULL,
+    template TEXT NOT NULL,
+    template_version TEXT NOT NULL,
+    placeholders TEXT NOT NULL,
+    files TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def load_git_accounts(config_file=DEFAULT_CONFIG_FILE):
+    """Load Git accounts from configuration file"""
+    if os.path.exists(config_file):
+        try:
+            with open(config_file, 'r') as f:
+                return json.load(f)
+        except:
+            return dict(DEFAULT_ACCOUNTS)
+    else:
+        # Create default config file
+        save_git_accounts(DEFAULT_ACCOUNTS, config_file)
+        return dict(DEFAULT_ACCOUNTS)
+
+
+def read_git_accounts(config_file):
+    """Parse the accounts JSON file, raising ValueError instead of falling back to defaults"""
+    try:
+        with open(config_file, 'r') as f:
+            accounts = json.load(f)
+    except OSError as e:
+        raise ValueError(str(e))
+    if not isinstance(accounts, dict) or not all(isinstance(a, dict) for a in accounts.values()):
+        raise ValueError("expected an object of accounts")
+    return accounts
+
+
+def save_git_accounts(accounts, config_file=DEFAULT_CONFIG_FILE):
+    """Atomically write the accounts JSON file"""
+    _atomic_write(config_file, json.dumps(accounts, indent=2))
+
+
+def _atomic_write(path, content):
+    """Replace a file in one step so readers never see a partial write"""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(content)
+    if os.path.exists(path):
+        os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+    os.replace(tmp_path, path)
+
+
+def read_accounts(db_path, config_file=DEFAULT_CONFIG_FILE):
+    """The accounts a registry would have after migrating, without writing anything
+
+    For dry runs: the registry is only opened read-only, and neither it nor
+    a missing accounts file is created.
+    """
+    try:
+        config_mtime = os.stat(config_file).st_mtime_ns
+    except OSError:
+        config_mtime = None
+    registered, imported = None, None
+    if os.path.exists(db_path):
+        from urllib.parse import quote
+
+        # With no other connection open the database is fully checkpointed; reading
+        # it as immutable then avoids creating the -wal and -shm files
+        mode = "mode=ro" if os.path.exists(f"{db_path}-shm") else "immutable=1"
+        db = sqlite3.connect(f"file:{quote(os.path.abspath(db_path))}?{mode}", uri=True)
+        try:
+            row = db.execute("SELECT value FROM meta WHERE key = 'accounts_imported'").fetchone()
+            imported = row and row[0]
+            registered = AccountRegistry._accounts(db)
+        except sqlite3.Error:
+            pass
+        finally:
+            db.close()
+    if config_mtime is not None and imported != str(config_mtime):
+        try:
+            return read_git_accounts(config_file)
+        except ValueError:
+            # migrate() keeps the registered accounts in this case too
+            pass
+    if registered:
+        return registered
+    return dict(DEFAULT_ACCOUNTS)
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive advisory lock shared between processes"""
+    with open(path, 'a') as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class AccountRegistry:
+    """Accounts and their repositories in one SQLite database"""
+
+    def __init__(self, db_path, config_file=DEFAULT_CONFIG_FILE, allowed_repos_file=None):
+        self.db_path = db_path
+        self.config_file = config_file
+        self.allowed_repos_file = allowed_repos_file
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._connection().executescript(SCHEMA)
+        self.migrate()
+
+    @classmethod
+    def for_developer_dir(cls, developer_dir, state_dir, config_file=DEFAULT_CONFIG_FILE):
+        """Registry stored in the tool's state directory under developer_dir"""
+        return cls(os.path.join(state_dir, REGISTRY_FILENAME), config_file,
+                   os.path.join(developer_dir, ALLOWED_REPOS_FILENAME))
+
+    def _connection(self):
+        """One connection per thread; SQLite serializes writers across processes"""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _transaction(self):
+        """Run statements in an immediate (write-locked) transaction"""
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def _meta(self, db, key, default=None):
+        row = db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, db, key, value):
+        db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def migrate(self):
+        """Import git-accounts.json and the allowed-repositories file when they changed"""
+        with self._transaction() as db:
+            config_mtime = self._config_mtime()
+            if config_mtime is None and not self._meta(db, "accounts_imported"):
+                # Nothing to import: seed the default account like the JSON loader did
+                if not self._accounts(db):
+                    self._replace_accounts(db, load_git_accounts(self.config_file))
+                self._set_meta(db, "accounts_imported", self._config_mtime())
+            elif config_mtime is not None and self._meta(db, "accounts_imported") != str(config_mtime):
+                # Hand edits to the JSON file win over the registry, unless it does not parse
+                try:
+                    accounts = read_git_accounts(self.config_file)
+                except ValueError as e:
+                    print(f"Warning: Could not read {self.config_file}, keeping the "
+                          f"registered accounts: {e}")
+                else:
+                    self._replace_accounts(db, accounts)
+                    self._set_meta(db, "accounts_imported", config_mtime)
+
+            mtime = self._allowed_repos_mtime()
+            if mtime is not None and self._meta(db, "allowed_repos_imported") != str(mtime):
+                with open(self.allowed_repos_file, 'r') as f:
+                    self._import_allowed_repos(db, f.read().split('\n'), mtime)
+
+    def _config_mtime(self):
+        try:
+            return os.stat(self.config_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def _allowed_repos_mtime(self):
+        if not self.allowed_repos_file:
+            return None
+        try:
+            return os.stat(self.allowed_repos_file).st_mtime_ns
+        except OSError:
+            return None
+
+    @classmethod
+    def _listed_repos(cls, lines, accounts):
+        """{account key: [repos]} of the lines of an allowed-repositories file"""
+        listed = {}
+        for line in lines:
+            parts = line.split('|')
+            if len(parts) < 5:
+                continue
+            repos = listed.setdefault(cls._resolve_account(accounts, parts[0]), [])
+            repos.extend(repo.strip() for repo in parts[4].split(',') if repo.strip())
+        return listed
+
+    def _import_allowed_repos(self, db, lines, mtime):
+        """Apply the allowed-repositories file to the registry
+
+        Repositories removed from an account's line by hand since the file
+        was last imported or exported are removed from the registry too, so
+        the next export does not bring them back.
+        """
+        listed = self._listed_repos(lines, self._accounts(db))
+        previous = json.loads(self._meta(db, "allowed_repos_listed", "{}"))
+        for account, repos in listed.items():
+            for repo in set(previous.get(account, ())) - set(repos):
+                db.execute("DELETE FROM repositories WHERE account = ? AND repo = ?",
+                           (account, repo))
+            for repo in repos:
+                db.execute("INSERT OR IGNORE INTO repositories VALUES (?, ?, ?)",
+                           (account, repo, time.time()))
+        self._record_allowed_repos(db, listed, mtime)
+
+    def _record_allowed_repos(self, db, listed, mtime):
+        """Remember what the file listed at mtime, to tell hand edits from our own writes"""
+        self._set_meta(db, "allowed_repos_imported", mtime)
+        self._set_meta(db, "allowed_repos_listed", json.dumps(listed))
+
+    @staticmethod
+    def _resolve_account(accounts, label):
+        """Map an allowed-repositories line label (key or Git user name) to an account key"""
+        if label in accounts:
+            return label
+        for key, account in accounts.items():
+            if account.get("name") == label:
+                return key
+        return label
+
+    @staticmethod
+    def _accounts(db):
+        accounts = {}
+        for row in db.execute("SELECT key, name, email, ssh_host, ssh_key, extra FROM accounts "
+                              "ORDER BY rowid"):
+            account = json.loads(row[5])
+            account.update(zip(ACCOUNT_FIELDS, row[1:5]))
+            accounts[row[0]] = account
+        return accounts
+
+    def accounts(self):
+        """All accounts as {key: {name, email, ssh_host, ssh_key, ...}}"""
+        return self._accounts(self._connection())
+
+    def account(self, key):
+        """One account by key, or None"""
+        row = self._connection().execute(
+            "SELECT name, email, ssh_host, ssh_key, extra FROM accounts WHERE key = ?",
+            (key,)).fetchone()
+        if row is None:
+            return None
+        account = json.loads(row[4])
+        account.update(zip(ACCOUNT_FIELDS, row[:4]))
+        return account
+
+    def _replace_accounts(self, db, accounts):
+        db.execute("DELETE FROM accounts")
+        for key, account in accounts.items():
+            extra = {k: v for k, v in account.items() if k not in ACCOUNT_FIELDS}
+            db.execute("INSERT INTO accounts VALUES (?, ?, ?, ?, ?, ?)",
+                       (key, *(account.get(field, "") for field in ACCOUNT_FIELDS),
+                        json.dumps(extra)))
+
+    def save_accounts(self, accounts):
+        """Replace all accounts and mirror them to the JSON file"""
+        with self._transaction() as db:
+            self._replace_accounts(db, accounts)
+            save_git_accounts(accounts, self.config_file)
+            self._set_meta(db, "accounts_imported", self._config_mtime())
+
+    def add_repository(self, account, repo):
+        """Record a repository for an account (append-only, idempotent)"""
+        with self._transaction() as db:
+            db.execute("INSERT OR IGNORE INTO repositories VALUES (?, ?, ?)",
+                       (account, repo, time.time()))
+
+    def repositories(self, account):
+        """Repositories of one account in creation order"""
+        rows = self._connection().execute(
+            "SELECT repo FROM repositories WHERE account = ? ORDER BY created_at, rowid",
+            (account,))
+        return [row[0] for row in rows]
+
+    def record_project(self, path, name, account, template, template_version, placeholders,
+                       files):
+        """Remember what a project was generated from: template, values and file hashes"""
+        with self._transaction() as db:
+            db.execute("INSERT OR REPLACE INTO projects VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                       (os.path.abspath(path), name, account, template, template_version,
+                        json.dumps(placeholders), json.dumps(files), time.time()))
+
+    def projects(self, template=None):
+        """Generation records of all projects (optionally only those of one template)"""
+        query = ("SELECT path, name, account, template, template_version, placeholders, files "
+                 "FROM projects")
+        args = ()
+        if template is not None:
+            query += " WHERE template = ?"
+            args = (template,)
+        return [{"path": row[0], "name": row[1], "account": row[2], "template": row[3],
+                 "template_version": row[4], "placeholders": json.loads(row[5]),
+                 "files": json.loads(row[6])}
+                for row in self._connection().execute(query + " ORDER BY name", args)]
+
+    def export_allowed_repos(self):
+        """Merge registered repositories into the legacy allowed-repositories file
+
+        Only lines that already exist are updated (their other fields are not
+        known to the registry). Hand edits made since the last import are
+        imported first. The file is locked and atomically replaced.
+        """
+        path = self.allowed_repos_file
+        if not path or not os.path.exists(path):
+            return
+        with file_lock(os.path.join(os.path.dirname(os.path.abspath(self.db_path)),
+                                    "allowed-repos.lock")):
+            with self._transaction() as db:
+                mtime = self._allowed_repos_mtime()
+                with open(path, 'r') as f:
+                    lines = f.read().split('\n')
+                if self._meta(db, "allowed_repos_imported") != str(mtime):
+                    self._import_allowed_repos(db, lines, mtime)
+                accounts = self._accounts(db)
+                changed = False
+                for i, line in enumerate(lines):
+                    parts = line.split('|')
+                    if len(parts) < 5:
+                        continue
+                    account = self._resolve_account(accounts, parts[0])
+                    repos = [r for r in parts[4].split(',') if r]
+                    known = set(repos)
+                    missing = [r for r in self.repositories(account) if r not in known]
+                    if missing:
+                        parts[4] = ','.join(repos + missing)
+                        lines[i] = '|'.join(parts)
+                        changed = True
+                if changed:
+                    _atomic_write(path, '\n'.join(lines))
+                    self._record_allowed_repos(db, self._listed_repos(lines, accounts),
+                                               self._allowed_repos_mtime())
+
+
+def _search_words(text):
+    """Lowercase words of a key, name or email ("jane.doe@corp.io" -> jane, doe, corp, io)"""
+    words, word = [], []
+    for ch in text.lower():
+        if ch.isalnum():
+            word.append(ch)
+        elif word:
+            words.append("".join(word))
+            word = []
+    if word:
+        words.append("".join(word))
+    return words
+
+
+class AccountIndex:
+    """Accounts kept sorted by key, with a prefix index over keys, names and emails
+
+    Adding, changing or removing one account only touches that account's
+    entries, and a search looks up each query word by bisection, so both
+    stay fast with thousands of accounts.
+    """
+
+    def __init__(self, accounts=None):
+        self.accounts = {}
+        self._keys = []
+        self._sort_keys = []
+        self._words = []
+        self._account_words = {}
+        # One sort for the initial accounts instead of an insertion each
+        for key, account in (accounts or {}).items():
+            if key not in self.accounts:
+                self._keys.append(key)
+            self.accounts[key] = account
+            self._account_words[key] = self._index_words(key, account)
+        self._keys.sort(key=self._sort_key)
+        self._sort_keys = [self._sort_key(key) for key in self._keys]
+        self._words = sorted((word, key) for key, words in self._account_words.items()
+                             for word in words)
+
+    def __len__(self):
+        return len(self.accounts)
+
+    def __contains__(self, key):
+        return key in self.accounts
+
+    @staticmethod
+    def _sort_key(key):
+        return (key.lower(), key)
+
+    def keys(self):
+        """All keys in display order (the index's own list: do not modify it)"""
+        return self._keys
+
+    def set(self, key, account):
+        """Add or replace an account"""
+        if key in self.accounts:
+            self._remove_words(key)
+        else:
+            sort_key = self._sort_key(key)
+            position = bisect.bisect_left(self._sort_keys, sort_key)
+            self._sort_keys.insert(position, sort_key)
+            self._keys.insert(position, key)
+        self.accounts[key] = account
+        words = self._account_words[key] = self._index_words(key, account)
+        for word in words:
+            bisect.insort(self._words, (word, key))
+
+    @staticmethod
+    def _index_words(key, account):
+        """Words an account can be found by"""
+        words = set(_search_words(key))
+        for field in ("name", "email"):
+            words.update(_search_words(account.get(field, "")))
+        # The whole email too, so "jane.doe@" keeps matching while it is typed
+        words.add(account.get("email", "").lower())
+        words.discard("")
+        return words
+
+    def remove(self, key):
+        """Drop an account (no error if it is unknown)"""
+        if key not in self.accounts:
+            return
+        self._remove_words(key)
+        position = bisect.bisect_left(self._sort_keys, self._sort_key(key))
+        del self._sort_keys[position], self._keys[position]
+        del self.accounts[key]
+
+    def _remove_words(self, key):
+        for word in self._account_words.pop(key, ()):
+            position = bisect.bisect_left(self._words, (word, key))
+            del self._words[position]
+
+    def _prefix_matches(self, prefix):
+        matches = set()
+        position = bisect.bisect_left(self._words, (prefix, ""))
+        while position < len(self._words) and self._words[position][0].startswith(prefix):
+            matches.add(self._words[position][1])
+            position += 1
+        return matches
+
+    def search(self, query):
+        """Keys in display order whose words start with every word of the query"""
+        query = query.strip().lower()
+        if not query:
+            return self._keys
+        matches = None
+        for word in query.split():
+            # "jane.doe" is looked up whole (emails) as well as word by word
+            found = self._prefix_matches(word)
+            parts = _search_words(word)
+            if len(parts) > 1 or (parts and parts[0] != word):
+                by_parts = None
+                for part in parts:
+                    part_matches = self._prefix_matches(part)
+                    by_parts = part_matches if by_parts is None else by_parts & part_matches
+                found |= by_parts or set()
+            matches = found if matches is None else matches & found
+            if not matches:
+                return []
+        return sorted(matches, key=self._sort_key)
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Batch Project Setup
+Scaffolds many projects from a JSON or CSV manifest on a worker pool
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+from gitobjects import OBJECT_SHARING
+from materialize import TemplateMaterializer, parse_chain
+from accounts import DEFAULT_CONFIG_FILE
+from instrument import PERCENTILES, summarize
+from scaffold import (
+    DEFAULT_DEVELOPER_DIR, DEFAULT_TEMPLATE_DIR, GIT_BACKENDS,
+    ProjectScaffolder, open_registry, open_template_registry
+)
+from staging import sync_filesystem, sync_tree
+from template_registry import TemplateError
+
+NAME_KEYS = ("name", "project", "project_name")
+ACCOUNT_KEYS = ("account", "git_account")
+TEMPLATE_KEYS = ("template",)
+
+
+def _pick(entry, keys):
+    """Return the first non-empty value for any of the given keys"""
+    for key in keys:
+        value = entry.get(key)
+        if value:
+            return str(value).strip()
+    return ""
+
+
+def _normalize_entry(entry):
+    """Turn a raw manifest row into {name, account, placeholders}"""
+    placeholders = dict(entry.get("placeholders") or {})
+    # Any other column is treated as a placeholder value (CSV has no nesting)
+    for key, value in entry.items():
+        if key in NAME_KEYS or key in ACCOUNT_KEYS or key in TEMPLATE_KEYS or key == "placeholders":
+            continue
+        if value not in (None, ""):
+            placeholders[key.strip("[]").upper()] = value
+    return {
+        "name": _pick(entry, NAME_KEYS),
+        "account": _pick(entry, ACCOUNT_KEYS),
+        "template": _pick(entry, TEMPLATE_KEYS),
+        "placeholders": placeholders
+    }
+
+
+def load_manifest(path):
+    """Load project entries from a .json or .csv manifest"""
+    if path.lower().endswith(".csv"):
+        import csv
+        with open(path, 'r', newline='') as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, 'r') as f:
+            data = json.load(f)
+        rows = data.get("projects", []) if isinstance(data, dict) else data
+    return [_normalize_entry(row) for row in rows]
+
+
+def _create_one(scaffolder, entry):
+    """Create a single project and describe the outcome"""
+    result = {"project": entry["name"], "account": entry["account"]}
+    start = time.perf_counter()
+    try:
+        result["path"] = scaffolder.create_project(
+            entry["name"], entry["account"], entry["placeholders"])
+        result["status"] = "ok"
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = str(e)
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    return result
+
+
+def run_batch(scaffolder, entries, workers=None, scaffolder_for=None):
+    """Create all manifest entries in parallel and return results in manifest order
+
+    scaffolder_for(entry), when given, picks the scaffolder of entries that
+    name their own template.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def create(entry):
+        if scaffolder_for is not None and entry.get("template"):
+            try:
+                return _create_one(scaffolder_for(entry), entry)
+            except Exception as e:
+                return {"project": entry["name"], "account": entry["account"],
+                        "status": "failed", "error": str(e), "seconds": 0.0}
+        return _create_one(scaffolder, entry)
+
+    workers = workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(create, entries))
+
+
+def print_report(results, stream=sys.stdout):
+    """Print a one-line summary per project"""
+    for result in results:
+        if result["status"] == "ok":
+            print(f"✅ {result['project']} ({result['seconds']}s) -> {result['path']}", file=stream)
+        else:
+            print(f"❌ {result['project']}: {result['error']}", file=stream)
+    failed = sum(1 for r in results if r["status"] != "ok")
+    print(f"\n{len(results) - failed} created, {failed} failed", file=stream)
+
+
+def print_timings(summary, stream=sys.stdout):
+    """Print per-stage percentiles (milliseconds) of a traced batch"""
+    columns = [f"p{pct}" for pct in PERCENTILES] + ["max"]
+    print(f"\n{'stage':<12}" + "".join(f"{c:>10}" for c in columns), file=stream)
+    for stage, entry in summary.items():
+        print(f"{stage:<12}" + "".join(f"{entry[c] * 1000:10.1f}" for c in columns), file=stream)
+
+
+def build_parser():
+    """Command line options for batch mode"""
+    parser = argparse.ArgumentParser(description="Create many projects from a manifest")
+    parser.add_argument("manifest", help="JSON or CSV file listing projects")
+    parser.add_argument("--accounts", default=DEFAULT_CONFIG_FILE,
+                        help="Git accounts configuration file")
+    parser.add_argument("--developer-dir", default=DEFAULT_DEVELOPER_DIR)
+    parser.add_argument("--template-dir", default=DEFAULT_TEMPLATE_DIR)
+    parser.add_argument("--template", help="Layered template for entries without their own, "
+                                           "e.g. project-template-minimal+stack-python")
+    parser.add_argument("--templates-dir", help="Where template layers live "
+                                                "(default: next to the default template)")
+    parser.add_argument("--copy-mode", default="auto",
+                        help="Comma separated fallback chain of reflink, hardlink, "
+                             "copy_file_range, sendfile, copy (default: auto)")
+    parser.add_argument("--git-backend", choices=GIT_BACKENDS, default="subprocess",
+                        help="'objects' writes repositories in-process without forking git")
+    parser.add_argument("--object-sharing", choices=OBJECT_SHARING + ("off",), default="link",
+                        help="How the objects backend shares cached template objects")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker threads (default: CPU count)")
+    parser.add_argument("--report", help="Write the JSON result report to this file")
+    return parser
+
+
+def main(argv=None):
+    """Batch entry point"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        chain = parse_chain(args.copy_mode)
+    except ValueError as e:
+        parser.error(str(e))
+
+    registry = open_registry(args.developer_dir, args.accounts)
+    templates = open_template_registry(args.developer_dir, args.templates_dir)
+    accounts = registry.accounts()
+
+    def make_scaffolder(template_dir):
+        scaffolder = ProjectScaffolder(accounts,
+                                       developer_dir=args.developer_dir,
+                                       template_dir=template_dir,
+                                       materializer=TemplateMaterializer(chain),
+                                       git_backend=args.git_backend,
+                                       object_sharing=None if args.object_sharing == "off"
+                                       else args.object_sharing,
+                                       registry=registry,
+                                       # Skeletons only move work around when throughput is what counts
+                                       pool_size=0,
+                                       # Flushed to disk once, after the whole batch
+                                       durable=False)
+        # One legacy allowed-repositories rewrite for the whole batch
+        scaffolder.export_allowed_repos = False
+        return scaffolder
+
+    try:
+        scaffolder = make_scaffolder(templates.compile(args.template) if args.template
+                                     else args.template_dir)
+    except TemplateError as e:
+        parser.error(str(e))
+
+    # Each layer combination is compiled once and gets its own scaffolder
+    by_template, lock = {}, threading.Lock()
+
+    def scaffolder_for(entry):
+        with lock:
+            if entry["template"] not in by_template:
+                derived = make_scaffolder(templates.compile(entry["template"]))
+                derived.tracer = scaffolder.tracer
+                by_template[entry["template"]] = derived
+            return by_template[entry["template"]]
+
+    results = run_batch(scaffolder, load_manifest(args.manifest), args.workers, scaffolder_for)
+    created = [r["path"] for r in results if r["status"] == "ok"]
+    if created and not sync_filesystem(args.developer_dir):
+        for path in created:
+            sync_tree(path)
+    registry.export_allowed_repos()
+
+    print_report(results)
+    if scaffolder.tracer:
+        # Set PROJECT_SETUP_TRACE to get these; the summary also goes to the trace output
+        summary = summarize(scaffolder.tracer.traces)
+        scaffolder.tracer.write({"summary": summary})
+        print_timings(summary)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    return 1 if any(r["status"] != "ok" for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Project Setup CLI
+Scriptable front-end to the scaffolding core; never imports tkinter and only
+imports what the chosen command needs
+
+Usage:
+    python3 cli.py create NAME [--account KEY] [--set KEY=VALUE ...] [--dry-run]
+                               [--git-backend subprocess|objects]
+                               [--template BASE+STACK+TEAM [--templates-dir DIR]]
+                               [--pool N] [--no-daemon]
+    python3 cli.py batch MANIFEST [options]     (see batch.py --help)
+    python3 cli.py accounts
+    python3 cli.py upgrade [NAME ...] [--dry-run] [--commit]   (see upgrade.py --help)
+    python3 cli.py drift [NAME ...] [--report FILE|-]           (see drift.py --help)
+    python3 cli.py pack build TEMPLATE_DIR [-o OUT.ptpl] [--compress]
+    python3 cli.py pack info PACK.ptpl
+    python3 cli.py pool [--size N] [--git-backend subprocess|objects] [--template ...]
+    python3 cli.py daemon [options]             (see daemon.py --help)
+
+--pool N (or PROJECT_SETUP_POOL=N) claims a pre-built skeleton and refills the pool
+after reporting the project; "pool" fills it ahead of time.
+create hands the project to the daemon of the developer directory when one is running
+(it then uses the daemon's accounts file); --no-daemon always creates it in-process.
+
+--template-dir also takes a compiled template (.ptpl) built by "pack build".
+Every command except pack accepts --accounts FILE, --developer-dir DIR and --template-dir DIR.
+"""
+
+import os
+import sys
+
+USAGE = __doc__.split("Usage:", 1)[1].rstrip()
+
+
+class UsageError(Exception):
+    """Raised for malformed command lines"""
+
+
+def _parse_options(argv, options, flags=(), repeated=()):
+    """Tiny getopt-style parser; argparse alone costs more than our whole start budget
+
+    Returns (positional arguments, {option: value}); repeated options collect lists.
+    """
+    values = {name: [] for name in repeated}
+    positional = []
+    args = iter(argv)
+    for arg in args:
+        if not arg.startswith("--"):
+            positional.append(arg)
+            continue
+        name, sep, value = arg[2:].partition("=")
+        if name in flags and not sep:
+            values[name] = True
+        elif name in options or name in repeated:
+            if not sep:
+                value = next(args, None)
+                if value is None:
+                    raise UsageError(f"--{name} needs a value")
+            if name in repeated:
+                values[name].append(value)
+            else:
+                values[name] = value
+        else:
+            raise UsageError(f"Unknown option --{name}")
+    return positional, values
+
+
+def _locations(values):
+    """Accounts file, developer and template directories with their defaults"""
+    from accounts import DEFAULT_CONFIG_FILE
+    from scaffold import DEFAULT_DEVELOPER_DIR, DEFAULT_TEMPLATE_DIR
+
+    return (values.get("accounts", DEFAULT_CONFIG_FILE),
+            values.get("developer-dir", DEFAULT_DEVELOPER_DIR),
+            values.get("template-dir", DEFAULT_TEMPLATE_DIR))
+
+
+LOCATION_OPTIONS = ("accounts", "developer-dir", "template-dir")
+TEMPLATE_OPTIONS = ("template", "templates-dir")
+
+
+def _parse_assignments(pairs):
+    """Turn ['KEY=VALUE', ...] into a placeholder dict"""
+    values = {}
+    for pair in pairs:
+        key, sep, value = pair.partition("=")
+        if not sep or not key:
+            raise UsageError(f"Expected KEY=VALUE, got {pair!r}")
+        values[key.strip("[]").upper()] = value
+    return values
+
+
+def _git_backend(options):
+    """The --git-backend option, validated"""
+    from scaffold import GIT_BACKENDS
+
+    git_backend = options.get("git-backend", "subprocess")
+    if git_backend not in GIT_BACKENDS:
+        raise UsageError(f"--git-backend must be one of {', '.join(GIT_BACKENDS)}")
+    return git_backend
+
+
+def _pool_size(options):
+    """The --pool/--size option as a number (None when not given)"""
+    value = options.get("pool", options.get("size"))
+    if value is None:
+        return None
+    if not value.isdigit():
+        raise UsageError(f"Expected a number of skeletons, got {value!r}")
+    return int(value)
+
+
+def _template_dir(options, developer_dir, template_dir):
+    """--template-dir, or the compiled --template combination"""
+    if not options.get("template"):
+        return template_dir
+    from scaffold import open_template_registry
+    return open_template_registry(
+        developer_dir, options.get("templates-dir")).compile(options["template"])
+
+
+def cmd_create(argv):
+    """Create one project"""
+    from scaffold import ProjectScaffolder, ScaffoldError, open_registry
+    from template_registry import TemplateError
+
+    positional, options = _parse_options(
+        argv, LOCATION_OPTIONS + TEMPLATE_OPTIONS + ("account", "git-backend", "pool"),
+        flags=("dry-run", "no-daemon"), repeated=("set",))
+    if len(positional) != 1:
+        raise UsageError("create takes exactly one project name")
+    name = positional[0]
+    placeholders = _parse_assignments(options["set"])
+    git_backend = _git_backend(options)
+    pool_size = _pool_size(options)
+    config_file, developer_dir, template_dir = _locations(options)
+    if options.get("dry-run"):
+        return _dry_run(name, options, placeholders, config_file, developer_dir, template_dir)
+    if not options.get("no-daemon"):
+        from daemon import DaemonClient
+        client = DaemonClient.connect(developer_dir)
+        if client is not None:
+            return _create_in_daemon(client, name, options, placeholders)
+    try:
+        template_dir = _template_dir(options, developer_dir, template_dir)
+    except TemplateError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    registry = open_registry(developer_dir, config_file)
+    accounts = registry.accounts()
+    account = options.get("account") or next(iter(accounts), "")
+    scaffolder = ProjectScaffolder(accounts, developer_dir, template_dir,
+                                   git_backend=git_backend, registry=registry,
+                                   pool_size=pool_size)
+    try:
+        project_path = scaffolder.create_project(name, account, placeholders)
+    except ScaffoldError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"Project '{name}' created successfully at {project_path}", flush=True)
+    if scaffolder.pool is not None:
+        # The project is reported; finish the refill before the process goes away
+        scaffolder.pool.refill_async().join()
+    return 0
+
+
+def _scratch_dir(needed):
+    """A temporary directory when needed, otherwise a context that yields None"""
+    if not needed:
+        import contextlib
+        return contextlib.nullcontext()
+    import tempfile
+    return tempfile.TemporaryDirectory(prefix="project-setup-dry-run-")
+
+
+def _dry_run(name, options, placeholders, config_file, developer_dir, template_dir):
+    """Report what create would do without writing anything
+
+    Accounts are read without opening the registry for writing, template
+    indexes are built in memory, and a --template combination is compiled
+    into a scratch directory that is removed afterwards.
+    """
+    from accounts import REGISTRY_FILENAME, read_accounts
+    from scaffold import STATE_DIRNAME, ProjectScaffolder, ScaffoldError, open_template_registry
+    from template_registry import TemplateError
+
+    accounts = read_accounts(os.path.join(developer_dir, STATE_DIRNAME, REGISTRY_FILENAME),
+                             config_file)
+    account = options.get("account") or next(iter(accounts), "")
+    with _scratch_dir(options.get("template")) as scratch:
+        try:
+            if options.get("template"):
+                template_dir = open_template_registry(
+                    developer_dir, options.get("templates-dir"), compiled_dir=scratch,
+                    persist=False).compile(options["template"])
+            scaffolder = ProjectScaffolder(accounts, developer_dir, template_dir,
+                                           git_backend=_git_backend(options), pool_size=0)
+            scaffolder.save_template_index = False
+            scaffolder.validate(name, account)
+            index = scaffolder.template_index()
+            values = scaffolder.placeholder_values(name, account, placeholders)
+            templated = scaffolder.templated_paths(values)
+        except (ScaffoldError, TemplateError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+    print(f"Would create {scaffolder.project_path(name)} for account '{account}'")
+    print(f"  {len(index.files)} template files, {len(templated)} rendered: "
+          f"{', '.join(templated) or '-'}")
+    return 0
+
+
+def _create_in_daemon(client, name, options, placeholders):
+    """Let the running daemon create the project"""
+    from daemon import DaemonError
+    from scaffold import ScaffoldError
+
+    try:
+        account = options.get("account") or next(iter(client.request({"op": "accounts"})
+                                                      .get("accounts", {})), "")
+        project_path = client.create_project(name, account, placeholders,
+                                             template=options.get("template"),
+                                             template_dir=options.get("template-dir"),
+                                             git_backend=options.get("git-backend"))
+    except (ScaffoldError, DaemonError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"Project '{name}' created successfully at {project_path}")
+    return 0
+
+
+def cmd_daemon(argv):
+    """Serve project creation over a Unix socket"""
+    import daemon
+    return daemon.main(argv)
+
+
+def cmd_pool(argv):
+    """Fill the pool of pre-built project skeletons"""
+    from project_pool import pool_size_from_env
+    from scaffold import ProjectScaffolder, open_registry
+    from template_registry import TemplateError
+
+    positional, options = _parse_options(
+        argv, LOCATION_OPTIONS + TEMPLATE_OPTIONS + ("size", "git-backend"))
+    if positional:
+        raise UsageError("pool takes no arguments")
+    git_backend = _git_backend(options)
+    size = _pool_size(options)
+    if size is None:
+        size = pool_size_from_env() or 1
+    config_file, developer_dir, template_dir = _locations(options)
+    try:
+        template_dir = _template_dir(options, developer_dir, template_dir)
+    except TemplateError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    registry = open_registry(developer_dir, config_file)
+    scaffolder = ProjectScaffolder(registry.accounts(), developer_dir, template_dir,
+                                   git_backend=git_backend, registry=registry, pool_size=size)
+    if scaffolder.pool is None:
+        raise UsageError("--size must be at least 1")
+    built = scaffolder.pool.fill()
+    print(f"Built {built} skeletons; {len(scaffolder.pool.ready())} ready in "
+          f"{scaffolder.pool.skeleton_dir()}")
+    return 0
+
+
+def cmd_batch(argv):
+    """Create many projects from a manifest"""
+    import batch
+    return batch.main(argv)
+
+
+def cmd_accounts(argv):
+    """List the configured Git accounts"""
+    from scaffold import open_registry
+
+    positional, options = _parse_options(argv, LOCATION_OPTIONS)
+    if positional:
+        raise UsageError("accounts takes no arguments")
+    config_file, developer_dir, _ = _locations(options)
+    registry = open_registry(developer_dir, config_file)
+    for key, account in registry.accounts().items():
+        print(f"{key}: {account['name']} <{account['email']}> via {account['ssh_host']}")
+    return 0
+
+
+def cmd_upgrade(argv):
+    """Apply template changes to existing projects"""
+    import upgrade
+    return upgrade.main(argv)
+
+
+def cmd_drift(argv):
+    """Find projects that drifted from their template"""
+    import drift
+    return drift.main(argv)
+
+
+def cmd_pack(argv):
+    """Build or inspect compiled templates"""
+    import template_pack
+    return template_pack.main(argv)
+
+
+COMMANDS = {
+    "create": cmd_create,
+    "batch": cmd_batch,
+    "accounts": cmd_accounts,
+    "upgrade": cmd_upgrade,
+    "drift": cmd_drift,
+    "pack": cmd_pack,
+    "pool": cmd_pool,
+    "daemon": cmd_daemon,
+}
+
+
+def main(argv=None):
+    """CLI entry point"""
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in COMMANDS:
+        print(f"Usage:{USAGE}", file=sys.stderr)
+        return 0 if argv and argv[0] in ("-h", "--help") else 2
+    try:
+        return COMMANDS[argv[0]](argv[1:])
+    except UsageError as e:
+        print(f"Error: {e}\nUsage:{USAGE}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    # Resolve sibling modules even when started through a symlink
+    sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+    sys.exit(main())
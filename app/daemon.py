@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+Scaffolding Daemon
+Keeps accounts and templates loaded in one resident process and creates
+projects for the GUI, the CLI and scripts over a Unix domain socket
+
+Protocol: one JSON object per line in each direction. A request
+    {"op": "create", "name": "my-app", "account": "personal",
+     "placeholders": {"LANGUAGE": "Go"}, "template": "base+stack-python",
+     "id": "any-string", "progress": true}
+is answered with {"progress": STAGE, "step": N, "total": M} lines (only when
+"progress" is true) and then one result line:
+    {"ok": true, "status": "ok", "path": "...", "seconds": 0.012, "stages": [...]}
+    {"ok": false, "status": "failed" | "cancelled", "error": "..."}
+Other ops: "ping", "accounts", "status", "cancel" (with the create's "id")
+and "shutdown". A connection may send any number of requests; each
+connection is served on its own thread, so concurrent creates run in parallel.
+
+Usage:
+    python3 daemon.py [--developer-dir DIR] [--accounts FILE] [--template-dir DIR]
+"""
+
+import json
+import os
+import sys
+import threading
+
+SOCKET_NAME = "daemon.sock"
+
+# How often accounts and template directories are checked for changes
+DEFAULT_POLL_INTERVAL = 1.0
+
+
+class DaemonError(Exception):
+    """Raised when the daemon cannot start or cannot be reached"""
+
+
+def socket_path(developer_dir):
+    """The daemon socket of a developer directory"""
+    from scaffold import STATE_DIRNAME
+    return os.path.join(developer_dir, STATE_DIRNAME, SOCKET_NAME)
+
+
+def _connect(path, timeout=None):
+    import socket
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+class _ResultTracer:
+    """Tracer that hands each thread its last finished trace for the response
+
+    Nothing is kept across requests; traces are also written when
+    PROJECT_SETUP_TRACE is set.
+    """
+
+    def __init__(self, output=None):
+        self.output = output
+        self._last = threading.local()
+
+    def start(self, project):
+        from instrument import ProjectTrace
+        return ProjectTrace(project)
+
+    def finish(self, trace, status, error=None):
+        data = trace.to_dict(status, error)
+        self._last.data = data
+        if self.output is not None:
+            self.output.write(data)
+        return data
+
+    def take(self):
+        """The calling thread's last trace (once)"""
+        data = getattr(self._last, "data", None)
+        self._last.data = None
+        return data
+
+
+class ScaffoldDaemon:
+    """Resident scaffolders, one per template and git backend, shared by all clients"""
+
+    def __init__(self, developer_dir, config_file, template_dir, templates_dir=None,
+                 git_backend="subprocess", pool_size=None, poll_interval=DEFAULT_POLL_INTERVAL):
+        from instrument import tracer_from_env
+        from scaffold import open_registry, open_template_registry
+
+        # Results carry paths; make them valid for clients in any directory
+        developer_dir = os.path.abspath(developer_dir)
+        config_file = os.path.abspath(config_file)
+        if templates_dir:
+            templates_dir = os.path.abspath(templates_dir)
+        self.developer_dir = developer_dir
+        self.config_file = config_file
+        self.template_dir = os.path.abspath(template_dir)
+        self.git_backend = git_backend
+        self.pool_size = pool_size
+        self.poll_interval = poll_interval
+        self.registry = open_registry(developer_dir, config_file)
+        self.templates = open_template_registry(developer_dir, templates_dir)
+        self.accounts = self.registry.accounts()
+        self.tracer = _ResultTracer(tracer_from_env())
+        self._config_mtime = self._mtime(config_file)
+        self._scaffolders = {}
+        self._watched = {}
+        self._running = {}
+        # Scaffolder of each running job, and replaced ones waiting for their jobs to end
+        self._in_use = {}
+        self._retired = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._server = None
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def scaffolder(self, template_dir=None, git_backend=None):
+        """The resident scaffolder of a template (a directory or compiled template)"""
+        from scaffold import ProjectScaffolder
+
+        key = (os.path.abspath(template_dir or self.template_dir), git_backend or self.git_backend)
+        with self._lock:
+            scaffolder = self._scaffolders.get(key)
+            if scaffolder is None:
+                scaffolder = ProjectScaffolder(self.accounts, self.developer_dir, key[0],
+                                               git_backend=key[1], registry=self.registry,
+                                               pool_size=self.pool_size)
+                scaffolder.tracer = self.tracer
+                self._scaffolders[key] = scaffolder
+        if scaffolder.pool is not None:
+            scaffolder.pool.refill_async()
+        return scaffolder
+
+    def _template_changed(self, key, scaffolder):
+        """Whether a scaffolder's template directory no longer matches its index
+
+        Each poll only stats the template's directories; the whole template is
+        walked when one of them changed, or every TEMPLATE_RECHECK_SECONDS to
+        see in-place edits.
+        """
+        from scaffold import TEMPLATE_RECHECK_SECONDS
+        from template_index import PACK_SUFFIX, TemplateIndex, template_version
+
+        if key[0].endswith(PACK_SUFFIX):
+            # Compiled templates never change; layer edits compile to a new file and
+            # the template registry then deletes this one
+            return not os.path.exists(key[0])
+        with self._lock:
+            index = self._watched.get(key[0])
+            if index is None:
+                index = self._watched[key[0]] = TemplateIndex(key[0])
+        try:
+            if index.is_current(TEMPLATE_RECHECK_SECONDS):
+                return False
+            index.refresh()
+        except OSError as e:
+            print(f"Warning: Could not check template {key[0]}: {e}")
+            return False
+        return template_version(index.files) != template_version(scaffolder.template_index().files)
+
+    def _retire(self, key, scaffolder):
+        """Stop handing out a scaffolder; requests already running keep it and its consistent view"""
+        with self._lock:
+            if self._scaffolders.get(key) is scaffolder:
+                del self._scaffolders[key]
+                self._retired.append(scaffolder)
+        self._close_retired()
+
+    def _close_retired(self):
+        """Release the compiled templates of retired scaffolders no running job uses"""
+        with self._lock:
+            in_use = {id(scaffolder) for scaffolder in self._in_use.values()}
+            idle = [s for s in self._retired if id(s) not in in_use]
+            self._retired = [s for s in self._retired if id(s) in in_use]
+        for scaffolder in idle:
+            scaffolder.close()
+
+    def check_changes(self):
+        """Reload accounts and replace scaffolders whose template directory changed"""
+        mtime = self._mtime(self.config_file)
+        if mtime != self._config_mtime:
+            self._config_mtime = mtime
+            self.registry.migrate()
+            self.accounts = self.registry.accounts()
+            with self._lock:
+                for scaffolder in self._scaffolders.values():
+                    scaffolder.git_accounts = self.accounts
+
+        with self._lock:
+            scaffolders = list(self._scaffolders.items())
+        for key, scaffolder in scaffolders:
+            if self._template_changed(key, scaffolder):
+                self._retire(key, scaffolder)
+
+    def watch(self):
+        """Check for changes every poll_interval until stopped"""
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                self.check_changes()
+            except Exception as e:
+                print(f"Warning: Could not check for changes: {e}")
+
+    def handle(self, request, send=None):
+        """Answer one request; send(message) streams progress lines"""
+        op = request.get("op")
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid()}
+        if op == "accounts":
+            return {"ok": True, "accounts": self.accounts}
+        if op == "status":
+            with self._lock:
+                return {"ok": True, "running": sorted(name for name, _ in self._running.values()),
+                        "templates": [key[0] for key in self._scaffolders]}
+        if op == "cancel":
+            with self._lock:
+                job = self._running.get(request.get("id"))
+            if job is not None:
+                job[1].set()
+            return {"ok": job is not None}
+        if op == "shutdown":
+            # The connection handler stops the server once this answer is sent
+            return {"ok": True}
+        if op == "create":
+            return self.create(request, send)
+        return {"ok": False, "error": f"Unknown op: {op!r}"}
+
+    def create(self, request, send=None):
+        """Create a project and return its result with timings"""
+        from scaffold import ScaffoldError
+        from template_registry import TemplateError
+
+        name = request.get("name") or ""
+        job_id = request.get("id") or os.urandom(8).hex()
+        cancel = threading.Event()
+        with self._lock:
+            if any(running == name for running, _ in self._running.values()):
+                return {"ok": False, "status": "failed",
+                        "error": f"Project '{name}' is already being created!"}
+            self._running[job_id] = (name, cancel)
+        try:
+            template_dir = request.get("template_dir")
+            if request.get("template"):
+                template_dir = self.templates.compile(request["template"])
+            scaffolder = self.scaffolder(template_dir, request.get("git_backend"))
+            with self._lock:
+                self._in_use[job_id] = scaffolder
+
+            progress = None
+            if send is not None and request.get("progress"):
+                def progress(stage, step, total):
+                    send({"progress": stage, "step": step, "total": total})
+
+            self.tracer.take()
+            try:
+                path = scaffolder.create_project(name, request.get("account", ""),
+                                                 request.get("placeholders"), progress, cancel)
+            except ScaffoldError as e:
+                result = self.tracer.take() or {"status": "failed", "error": str(e)}
+                return dict(result, ok=False, error=str(e))
+            return dict(self.tracer.take() or {"status": "ok"}, ok=True, path=path)
+        except TemplateError as e:
+            return {"ok": False, "status": "failed", "error": str(e)}
+        except Exception as e:
+            return dict(self.tracer.take() or {"status": "failed"}, ok=False, error=str(e))
+        finally:
+            with self._lock:
+                del self._running[job_id]
+                self._in_use.pop(job_id, None)
+            self._close_retired()
+
+    def serve(self, path=None):
+        """Listen on the socket until a shutdown request (or stop())"""
+        import socketserver
+
+        path = path or socket_path(self.developer_dir)
+        if os.path.exists(path):
+            try:
+                _connect(path, timeout=1).close()
+            except OSError:
+                # Left behind by a daemon that did not exit cleanly
+                os.unlink(path)
+            else:
+                raise DaemonError(f"A daemon is already listening on {path}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                lock = threading.Lock()
+
+                def send(message):
+                    with lock:
+                        self.wfile.write(json.dumps(message).encode() + b"\n")
+                        self.wfile.flush()
+
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    try:
+                        request = json.loads(line)
+                        if not isinstance(request, dict):
+                            raise ValueError("expected a JSON object")
+                    except ValueError as e:
+                        send({"ok": False, "error": f"Invalid request: {e}"})
+                        continue
+                    try:
+                        send(daemon.handle(request, send))
+                    except (BrokenPipeError, ConnectionResetError):
+                        return
+                    if request.get("op") == "shutdown":
+                        daemon.stop()
+                        return
+
+        class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+        # Only the owner may talk to the daemon: it creates repositories in their name
+        old_umask = os.umask(0o077)
+        try:
+            self._server = Server(path, Handler)
+        finally:
+            os.umask(old_umask)
+        watcher = threading.Thread(target=self.watch, name="daemon-watch", daemon=True)
+        watcher.start()
+        # Warm up the default template before the first request arrives
+        try:
+            self.scaffolder().template_index()
+        except OSError as e:
+            print(f"Warning: Could not load template {self.template_dir}: {e}")
+        try:
+            self._server.serve_forever()
+        finally:
+            self._stopped.set()
+            self._server.server_close()
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def stop(self):
+        """Stop serving (safe to call from a request thread)"""
+        self._stopped.set()
+        if self._server is not None:
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+
+
+class DaemonClient:
+    """Talks to a running daemon; create_project mirrors ProjectScaffolder's"""
+
+    def __init__(self, path):
+        self.path = path
+
+    @classmethod
+    def connect(cls, developer_dir):
+        """A client for the developer directory's daemon, or None if none is running"""
+        path = socket_path(os.path.abspath(developer_dir))
+        if not os.path.exists(path):
+            return None
+        try:
+            _connect(path, timeout=1).close()
+        except OSError:
+            return None
+        return cls(path)
+
+    def request(self, message, on_progress=None, cancel=None):
+        """Send one request and return its result"""
+        import socket
+
+        try:
+            sock = _connect(self.path)
+        except OSError as e:
+            raise DaemonError(f"Daemon not reachable at {self.path}: {e}")
+        try:
+            sock.sendall(json.dumps(message).encode() + b"\n")
+            if cancel is not None:
+                # Wake up regularly to forward a cancellation
+                sock.settimeout(0.1)
+            buffer = b""
+            cancel_sent = False
+            while True:
+                try:
+                    chunk = sock.recv(65536)
+                except socket.timeout:
+                    chunk = None
+                if cancel is not None and cancel.is_set() and not cancel_sent:
+                    self.request({"op": "cancel", "id": message.get("id")})
+                    cancel_sent = True
+                if chunk is None:
+                    continue
+                if not chunk:
+                    raise DaemonError("Daemon closed the connection")
+                buffer += chunk
+                while b"\n" in buffer:
+                    line, buffer = buffer.split(b"\n", 1)
+                    response = json.loads(line)
+                    if "progress" not in response:
+                        return response
+                    if on_progress is not None:
+                        on_progress(response["progress"], response["step"], response["total"])
+        finally:
+            sock.close()
+
+    def create_project(self, project_name, git_account, placeholders=None, progress=None,
+                       cancel=None, template=None, template_dir=None, git_backend=None):
+        """Create a project in the daemon and return its path (raises like the scaffolder)"""
+        from scaffold import ScaffoldCancelled, ScaffoldError
+
+        if cancel is not None and cancel.is_set():
+            raise ScaffoldCancelled(f"Creation of '{project_name}' was cancelled")
+        message = {"op": "create", "id": os.urandom(8).hex(), "name": project_name,
+                   "account": git_account, "placeholders": placeholders or {},
+                   "progress": progress is not None}
+        if template:
+            message["template"] = template
+        if template_dir:
+            message["template_dir"] = os.path.abspath(template_dir)
+        if git_backend:
+            message["git_backend"] = git_backend
+        result = self.request(message, progress, cancel)
+        if result.get("status") == "cancelled":
+            raise ScaffoldCancelled(result.get("error", "Cancelled"))
+        if not result.get("ok"):
+            raise ScaffoldError(result.get("error", "Project creation failed"))
+        return result["path"]
+
+
+def main(argv=None):
+    """Daemon entry point"""
+    import argparse
+
+    from accounts import DEFAULT_CONFIG_FILE
+    from scaffold import DEFAULT_DEVELOPER_DIR, DEFAULT_TEMPLATE_DIR, GIT_BACKENDS
+
+    parser = argparse.ArgumentParser(description="Serve project creation over a Unix socket")
+    parser.add_argument("--accounts", default=DEFAULT_CONFIG_FILE)
+    parser.add_argument("--developer-dir", default=DEFAULT_DEVELOPER_DIR)
+    parser.add_argument("--template-dir", default=DEFAULT_TEMPLATE_DIR)
+    parser.add_argument("--templates-dir", help="Where template layers live")
+    parser.add_argument("--git-backend", choices=GIT_BACKENDS, default="subprocess")
+    parser.add_argument("--pool", type=int, default=None,
+                        help="Pre-built skeletons per template (default: PROJECT_SETUP_POOL)")
+    parser.add_argument("--socket", help="Socket path (default: DEVELOPER_DIR/.project-setup/"
+                                         f"{SOCKET_NAME})")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="Seconds between checks for account and template changes")
+    args = parser.parse_args(argv)
+
+    daemon = ScaffoldDaemon(args.developer_dir, args.accounts, args.template_dir,
+                            args.templates_dir, args.git_backend, args.pool, args.poll_interval)
+    path = args.socket or socket_path(args.developer_dir)
+    print(f"Listening on {path}", flush=True)
+    try:
+        daemon.serve(path)
+    except DaemonError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
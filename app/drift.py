@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Template Drift Scan
+Read-only check of every recorded project against what the current template
+would produce for it: which template-owned files were hand-edited, deleted,
+or are still the template's old version. Directories with no record are
+listed as untracked. File hashes are cached by (path,
+mtime, size), so a repeat scan only re-reads files that changed.
+"""
+
+import hashlib
+import os
+import stat
+import sys
+import threading
+import time
+
+from template_index import template_version
+
+HASH_CACHE_FILENAME = "hash-cache.db"
+
+# Files modified this close to the scan are hashed but not cached: a write in
+# the same mtime tick would otherwise go unnoticed by later scans
+RACY_WINDOW_NS = 2 * 10**9
+
+CHUNK_SIZE = 1024 * 1024
+
+# What a project file can be, compared with the template
+FILE_STATES = ("modified", "deleted", "stale", "added", "obsolete")
+
+
+def hash_file(path, chunk_size=CHUNK_SIZE):
+    """SHA-256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class HashCache:
+    """Persistent (path, mtime, size) -> SHA-256 of project files
+
+    Entries are loaded once and written back in one transaction by save(),
+    so scanning threads only ever touch memory.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self._updates = {}
+        self._removed = set()
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        import sqlite3
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        db.execute("CREATE TABLE IF NOT EXISTS hashes (path TEXT PRIMARY KEY, "
+                   "mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, sha256 TEXT NOT NULL)")
+        return db
+
+    def load(self):
+        db = self._connect()
+        try:
+            self.entries = {row[0]: tuple(row[1:])
+                            for row in db.execute("SELECT path, mtime_ns, size, sha256 FROM hashes")}
+        finally:
+            db.close()
+        return self
+
+    def hash(self, path, st, started_ns):
+        """Content hash of a file whose stat result is st, from the cache when possible"""
+        entry = self.entries.get(path)
+        if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            with self._lock:
+                self.hits += 1
+            return entry[2]
+        sha = hash_file(path)
+        with self._lock:
+            self.misses += 1
+            if st.st_mtime_ns < started_ns - RACY_WINDOW_NS:
+                self._updates[path] = (st.st_mtime_ns, st.st_size, sha)
+        return sha
+
+    def forget(self, path):
+        """Drop the entry of a file that no longer exists"""
+        if path in self.entries:
+            with self._lock:
+                self._removed.add(path)
+
+    def forget_tree(self, root):
+        """Drop the entries of every file under a directory that no longer exists"""
+        prefix = os.path.join(root, "")
+        for path in [path for path in self.entries if path.startswith(prefix)]:
+            self.forget(path)
+
+    def save(self):
+        """Write new and changed hashes, and drop forgotten ones, in one transaction"""
+        if not self._updates and not self._removed:
+            return
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            db.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?)",
+                           [(path, *entry) for path, entry in self._updates.items()])
+            db.executemany("DELETE FROM hashes WHERE path = ?", [(p,) for p in self._removed])
+            db.execute("COMMIT")
+        finally:
+            db.close()
+        self.entries.update(self._updates)
+        for path in self._removed:
+            self.entries.pop(path, None)
+        self._updates, self._removed = {}, set()
+
+
+class DriftScanner:
+    """Compare the projects a scaffolder generated with its current template"""
+
+    def __init__(self, scaffolder, cache):
+        self.scaffolder = scaffolder
+        self.cache = cache
+        self._contents = {}
+        self._lock = threading.Lock()
+
+    def scan_all(self, names=None, workers=None):
+        """Scan every recorded project of the template (or just names), in parallel
+
+        Unrecorded directories under developer_dir are listed as "untracked".
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        index = self.scaffolder.template_index()
+        version = template_version(index.files)
+        records = self.scaffolder.registry.projects(index.source)
+        if names:
+            records = [r for r in records if r["name"] in names]
+        started_ns = time.time_ns()
+        workers = workers or os.cpu_count() or 1
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(
+                lambda r: self._scan_safely(r, index, version, started_ns), records))
+        self.cache.save()
+        return results + self.untracked(names)
+
+    def untracked(self, names=None):
+        """Directories under developer_dir that no template has a generation record for
+
+        They were created by hand or before projects were recorded, so there
+        is nothing to compare them with; they are only listed.
+        """
+        developer_dir = os.path.abspath(self.scaffolder.developer_dir)
+        known = {record["path"] for record in self.scaffolder.registry.projects()}
+        known.add(os.path.abspath(self.scaffolder.template_dir))
+        try:
+            entries = sorted(os.scandir(developer_dir), key=lambda e: e.name)
+        except FileNotFoundError:
+            return []
+        return [{"project": entry.name, "path": entry.path, "status": "untracked"}
+                for entry in entries
+                # Dot-directories include the tool's own state folder
+                if not entry.name.startswith(".") and entry.is_dir(follow_symlinks=False)
+                and entry.path not in known and (not names or entry.name in names)]
+
+    def _scan_safely(self, record, index, version, started_ns):
+        try:
+            return self.scan_project(record, index, version, started_ns)
+        except Exception as e:
+            return {"project": record["name"], "path": record["path"], "status": "failed",
+                    "error": str(e)}
+
+    def _template_content(self, key, read):
+        """Template file content by a cache key, read once for all projects"""
+        with self._lock:
+            if key in self._contents:
+                return self._contents[key]
+        data = read()
+        with self._lock:
+            self._contents[key] = data
+        return data
+
+    def scan_project(self, record, index, version, started_ns=None):
+        """Classify a project's template-owned files; never writes to the project"""
+        from render import PlaceholderRenderer
+
+        started_ns = started_ns or time.time_ns()
+        result = {"project": record["name"], "path": record["path"], "status": "clean",
+                  "template_version": record["template_version"],
+                  "outdated": record["template_version"] != version}
+        result.update((state, []) for state in FILE_STATES)
+        if not os.path.isdir(record["path"]):
+            result["status"] = "missing"
+            self.cache.forget_tree(record["path"])
+            return result
+
+        renderer = PlaceholderRenderer(record["placeholders"])
+        rendered = set(self.scaffolder.customize_paths)
+        store = self.scaffolder.template_store()
+        old_files = record["files"]
+
+        def current_sha(rel, entry):
+            # Untouched files are byte copies: the index already has their hash
+            if rel not in rendered or not index.placeholder_names(rel) & renderer.keys:
+                return entry["sha256"]
+            data = self._template_content(("current", rel), lambda: index.read(rel))
+            return hashlib.sha256(renderer.render_bytes(data)).hexdigest()
+
+        def generated_sha(rel):
+            # What the project got from the template version it was generated from
+            old_sha = old_files.get(rel)
+            if old_sha is None or rel not in rendered:
+                return old_sha
+            data = self._template_content(("stored", old_sha), lambda: store.get(old_sha))
+            return None if data is None else hashlib.sha256(renderer.render_bytes(data)).hexdigest()
+
+        def project_sha(rel):
+            path = os.path.join(record["path"], rel)
+            try:
+                st = os.lstat(path)
+            except FileNotFoundError:
+                self.cache.forget(path)
+                return None
+            if not stat.S_ISREG(st.st_mode):
+                # Replaced by a directory, symlink, ... never equal to a template file
+                return ""
+            return self.cache.hash(path, st, started_ns)
+
+        for rel, entry in index.files.items():
+            actual = project_sha(rel)
+            if actual is None:
+                # Deleted in the project, or added to the template since it was generated
+                result["deleted" if rel in old_files else "added"].append(rel)
+            elif actual != current_sha(rel, entry):
+                if old_files.get(rel) != entry["sha256"] and actual == generated_sha(rel):
+                    result["stale"].append(rel)
+                else:
+                    result["modified"].append(rel)
+
+        for rel in sorted(old_files.keys() - index.files.keys()):
+            # Dropped from the template; the project still has the file as generated
+            actual = project_sha(rel)
+            if actual is not None and actual == generated_sha(rel):
+                result["obsolete"].append(rel)
+
+        if result["modified"] or result["deleted"]:
+            result["status"] = "drifted"
+        elif result["stale"] or result["added"] or result["obsolete"] or result["outdated"]:
+            result["status"] = "stale"
+        return result
+
+
+def build_report(results, index, cache):
+    """Machine-readable report of a scan"""
+    counts = {}
+    for r in results:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    return {"template": index.source, "template_version": template_version(index.files),
+            "scanned_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "summary": {"projects": len(results), "statuses": counts,
+                        "files_hashed": cache.misses, "files_cached": cache.hits},
+            "projects": results}
+
+
+def print_report(report, stream=sys.stdout):
+    """One line per project that is not clean"""
+    for r in report["projects"]:
+        if r["status"] == "clean":
+            continue
+        if r["status"] == "untracked":
+            print(f"❔ {r['project']}: no generation record, not compared", file=stream)
+            continue
+        if r["status"] in ("failed", "missing"):
+            print(f"❌ {r['project']}: {r.get('error', 'project directory is gone')}", file=stream)
+            continue
+        parts = [f"{len(r[state])} {state}" for state in FILE_STATES if r[state]]
+        if r["outdated"]:
+            parts.append("older template version")
+        icon = "✏️ " if r["status"] == "drifted" else "🕰️ "
+        print(f"{icon}{r['project']}: {', '.join(parts)}", file=stream)
+        for state in ("modified", "deleted"):
+            for rel in r[state]:
+                print(f"    {state}: {rel}", file=stream)
+    summary = report["summary"]
+    statuses = ", ".join(f"{n} {status}" for status, n in sorted(summary["statuses"].items()))
+    print(f"\n{summary['projects']} projects: {statuses or 'none found'} "
+          f"({summary['files_hashed']} files hashed, {summary['files_cached']} from cache)",
+          file=stream)
+
+
+def main(argv=None):
+    """Drift scan entry point"""
+    import argparse
+    import json
+
+    from accounts import DEFAULT_CONFIG_FILE
+    from scaffold import (
+        DEFAULT_DEVELOPER_DIR, DEFAULT_TEMPLATE_DIR, STATE_DIRNAME,
+        ProjectScaffolder, open_registry, open_template_registry
+    )
+    from template_registry import TemplateError
+
+    parser = argparse.ArgumentParser(description="Find projects that drifted from their template")
+    parser.add_argument("projects", nargs="*", help="Project names (default: all)")
+    parser.add_argument("--accounts", default=DEFAULT_CONFIG_FILE)
+    parser.add_argument("--developer-dir", default=DEFAULT_DEVELOPER_DIR)
+    parser.add_argument("--template-dir", default=DEFAULT_TEMPLATE_DIR)
+    parser.add_argument("--template", help="Layered template whose projects to scan")
+    parser.add_argument("--templates-dir", help="Where template layers live")
+    parser.add_argument("--report", help="Write the JSON drift report to this file ('-' for stdout)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker threads (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    template_dir = args.template_dir
+    if args.template:
+        try:
+            template_dir = open_template_registry(
+                args.developer_dir, args.templates_dir).compile(args.template)
+        except TemplateError as e:
+            parser.error(str(e))
+    registry = open_registry(args.developer_dir, args.accounts)
+    scaffolder = ProjectScaffolder(registry.accounts(), args.developer_dir, template_dir,
+                                   registry=registry, pool_size=0)
+    cache = HashCache(os.path.join(args.developer_dir, STATE_DIRNAME, HASH_CACHE_FILENAME)).load()
+    results = DriftScanner(scaffolder, cache).scan_all(args.projects or None, args.workers)
+    report = build_report(results, scaffolder.template_index(), cache)
+
+    if args.report == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report)
+        if args.report:
+            with open(args.report, 'w') as f:
+                json.dump(report, f, indent=2)
+    # Untracked directories are reported but are not drift
+    return 0 if all(r["status"] in ("clean", "untracked") for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+In-Process Git Repository Writer
+Creates a repository with an initial commit by writing the .git layout,
+loose objects, refs and the index directly - no git subprocesses and no
+change of the process working directory
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import stat
+import struct
+import sys
+import threading
+import time
+import zlib
+
+GIT_DIR = ".git"
+OBJECT_SHARING = ("link", "alternates")
+LOOSE_COMPRESSION = 1  # git's default core.looseCompression
+NULL_SHA = "0" * 40
+
+
+class UnsupportedTree(Exception):
+    """Raised when a tree needs git features this writer does not implement"""
+
+
+def default_branch():
+    """init.defaultBranch from the user's git config, or git's own default"""
+    candidates = [os.path.expanduser("~/.gitconfig")]
+    xdg = os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+    candidates.insert(0, os.path.join(xdg, "git", "config"))
+
+    branch = "master"
+    for path in candidates:
+        try:
+            with open(path, 'r') as f:
+                lines = f.read().splitlines()
+        except OSError:
+            continue
+        section = ""
+        for line in lines:
+            line = line.strip()
+            if line.startswith("["):
+                section = line.strip("[]").strip().lower()
+            elif section == "init" and "=" in line:
+                key, value = (part.strip() for part in line.split("=", 1))
+                if key.lower() == "defaultbranch" and value:
+                    branch = value.strip('"')
+    return branch
+
+
+def _config_value(value):
+    """Quote a value for a git config file"""
+    value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    if value != value.strip() or any(c in value for c in "#;"):
+        return f'"{value}"'
+    return value
+
+
+def hash_object(kind, data):
+    """Return (hex id, uncompressed loose representation) of an object"""
+    raw = f"{kind} {len(data)}\0".encode() + data
+    return hashlib.sha1(raw).hexdigest(), raw
+
+
+def object_path(objects_dir, sha):
+    """Loose object location for a hex object id"""
+    return os.path.join(objects_dir, sha[:2], sha[2:])
+
+
+def write_loose_object(objects_dir, sha, raw):
+    """Store a loose object unless present; return whether it was written"""
+    path = object_path(objects_dir, sha)
+    if os.path.exists(path):
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename so a concurrent reader never sees a truncated object
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(zlib.compress(raw, LOOSE_COMPRESSION))
+    os.replace(tmp_path, path)
+    return True
+
+
+def tree_data(entries):
+    """Serialize (mode, name, hex id) entries into a tree object body"""
+    # Git orders tree entries as if directory names ended with "/"
+    ordered = sorted(entries, key=lambda e: e[1] + ("/" if e[0] == "40000" else ""))
+    return b"".join(f"{mode} {name}".encode() + b"\0" + bytes.fromhex(sha)
+                    for mode, name, sha in ordered)
+
+
+def git_mode(mode):
+    """Git file mode for a regular file's permission bits"""
+    return 0o100755 if mode & stat.S_IXUSR else 0o100644
+
+
+def build_trees(files, store_tree):
+    """Build trees bottom-up from {"dir/name": (git mode, blob id)}
+
+    store_tree(data) must return the tree id; it decides where (or whether)
+    the tree is written. Returns the root tree id, or None without files.
+    """
+    children, known_dirs = {}, set()
+    for rel, (mode, sha) in files.items():
+        parent, _, name = rel.rpartition("/")
+        children.setdefault(parent, []).append((f"{mode:o}", name, sha))
+        # Register every ancestor directory once with its own parent
+        while parent and parent not in known_dirs:
+            known_dirs.add(parent)
+            grandparent, _, dirname = parent.rpartition("/")
+            children.setdefault(grandparent, []).append(("40000", dirname, parent))
+            parent = grandparent
+
+    def resolve(rel_dir):
+        entries = []
+        for mode, name, ref in children.get(rel_dir, []):
+            entries.append((mode, name, resolve(ref) if mode == "40000" else ref))
+        return store_tree(tree_data(entries))
+
+    return resolve("") if files else None
+
+
+def _timestamp():
+    """Current time in git's '<seconds> <+hhmm>' form"""
+    now = time.time()
+    offset = time.localtime(now).tm_gmtoff // 60
+    sign = "+" if offset >= 0 else "-"
+    return f"{int(now)} {sign}{abs(offset) // 60:02d}{abs(offset) % 60:02d}"
+
+
+class GitObjectWriter:
+    """Write objects, refs and the index of a non-bare repository"""
+
+    def __init__(self, work_tree):
+        self.work_tree = work_tree
+        self.git_dir = os.path.join(work_tree, GIT_DIR)
+        self.objects_dir = os.path.join(self.git_dir, "objects")
+        self.objects_written = 0
+        self.objects_shared = 0
+
+    def init(self, branch, user_name, user_email, remote_url=None):
+        """Create the .git directory layout and config"""
+        for sub in ("objects/info", "objects/pack", "refs/heads", "refs/tags", "info"):
+            os.makedirs(os.path.join(self.git_dir, sub), exist_ok=True)
+
+        with open(os.path.join(self.git_dir, "HEAD"), 'w') as f:
+            f.write(f"ref: refs/heads/{branch}\n")
+
+        config = [
+            "[core]",
+            "\trepositoryformatversion = 0",
+            "\tfilemode = true",
+            "\tbare = false",
+            "\tlogallrefupdates = true",
+        ]
+        if sys.platform == "darwin":
+            config += ["\tignorecase = true", "\tprecomposeunicode = true"]
+        config += [
+            "[user]",
+            f"\tname = {_config_value(user_name)}",
+            f"\temail = {_config_value(user_email)}",
+        ]
+        if remote_url:
+            config += [
+                '[remote "origin"]',
+                f"\turl = {_config_value(remote_url)}",
+                "\tfetch = +refs/heads/*:refs/remotes/origin/*",
+            ]
+        with open(os.path.join(self.git_dir, "config"), 'w') as f:
+            f.write("\n".join(config) + "\n")
+
+    def write_object(self, kind, data):
+        """Store a loose object and return its hex id"""
+        sha, raw = hash_object(kind, data)
+        if write_loose_object(self.objects_dir, sha, raw):
+            self.objects_written += 1
+        return sha
+
+    def write_tree(self, entries):
+        """Write a tree from (mode, name, hex id) entries"""
+        return self.write_object("tree", tree_data(entries))
+
+    def write_commit(self, tree, message, author, parents=()):
+        """Write a commit authored and committed by 'Name <email>'"""
+        stamp = _timestamp()
+        lines = [f"tree {tree}"]
+        lines += [f"parent {parent}" for parent in parents]
+        lines += [f"author {author} {stamp}", f"committer {author} {stamp}", "", message]
+        return self.write_object("commit", ("\n".join(lines) + "\n").encode())
+
+    def update_ref(self, branch, sha, author, message):
+        """Point a branch at a commit and record it in the reflogs"""
+        ref = f"refs/heads/{branch}"
+        with open(os.path.join(self.git_dir, ref), 'w') as f:
+            f.write(sha + "\n")
+        entry = f"{NULL_SHA} {sha} {author} {_timestamp()}\t{message}\n"
+        for log in ("HEAD", ref):
+            path = os.path.join(self.git_dir, "logs", log)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'a') as f:
+                f.write(entry)
+
+    def add_all(self):
+        """Write blobs and trees for the work tree; return (root tree id, index entries)"""
+        index_entries = []
+        root = self._add_dir("", index_entries)
+        return root, index_entries
+
+    def _add_dir(self, rel_dir, index_entries):
+        """Recursively write one directory, returning its tree id (None if empty)"""
+        full_dir = os.path.join(self.work_tree, rel_dir) if rel_dir else self.work_tree
+        entries = []
+        with os.scandir(full_dir) as it:
+            for entry in it:
+                if entry.name == GIT_DIR:
+                    continue
+                if entry.name == ".gitignore":
+                    raise UnsupportedTree(".gitignore rules need the git CLI")
+                rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                st = entry.stat(follow_symlinks=False)
+                if stat.S_ISDIR(st.st_mode):
+                    sha = self._add_dir(rel, index_entries)
+                    if sha:
+                        entries.append(("40000", entry.name, sha))
+                    continue
+                if stat.S_ISLNK(st.st_mode):
+                    mode = 0o120000
+                    data = os.fsencode(os.readlink(entry.path))
+                elif stat.S_ISREG(st.st_mode):
+                    mode = git_mode(st.st_mode)
+                    with open(entry.path, 'rb') as f:
+                        data = f.read()
+                else:
+                    continue
+                sha = self.write_object("blob", data)
+                entries.append((f"{mode:o}", entry.name, sha))
+                index_entries.append((rel, mode, sha, st))
+        return self.write_tree(entries) if entries else None
+
+    def share_objects(self, cache, ids, sharing):
+        """Make cached objects available to this repository
+
+        "alternates" points the repository at the cache; "link" hardlinks the
+        (immutable) object files in, falling back to a copy across filesystems.
+        """
+        if sharing == "alternates":
+            with open(os.path.join(self.objects_dir, "info", "alternates"), 'w') as f:
+                f.write(os.path.abspath(cache.objects_dir) + "\n")
+            self.objects_shared += len(ids)
+            return
+        for sha in ids:
+            dst = object_path(self.objects_dir, sha)
+            if os.path.exists(dst):
+                continue
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            src = object_path(cache.objects_dir, sha)
+            try:
+                os.link(src, dst)
+            except OSError:
+                shutil.copyfile(src, dst)
+            self.objects_shared += 1
+
+    def write_index(self, index_entries):
+        """Write a version 2 index so the new work tree shows as clean"""
+        body = [struct.pack(">4sLL", b"DIRC", 2, len(index_entries))]
+        for rel, mode, sha, st in sorted(index_entries, key=lambda e: e[0].encode()):
+            name = rel.encode()
+            fields = struct.pack(
+                ">LLLLLLLLLL20sH",
+                int(st.st_ctime) & 0xFFFFFFFF, st.st_ctime_ns % 1000000000,
+                int(st.st_mtime) & 0xFFFFFFFF, st.st_mtime_ns % 1000000000,
+                st.st_dev & 0xFFFFFFFF, st.st_ino & 0xFFFFFFFF, mode,
+                st.st_uid & 0xFFFFFFFF, st.st_gid & 0xFFFFFFFF, st.st_size & 0xFFFFFFFF,
+                bytes.fromhex(sha), min(len(name), 0xFFF))
+            entry = fields + name
+            # Entries are NUL padded to a multiple of 8 bytes (at least one NUL)
+            body.append(entry + b"\0" * (8 - len(entry) % 8))
+        data = b"".join(body)
+        with open(os.path.join(self.git_dir, "index"), 'wb') as f:
+            f.write(data + hashlib.sha1(data).digest())
+
+
+def init_repository(project_path, user_name, user_email, remote_url, message, branch=None):
+    """Create a repository with one commit of the whole work tree, returning the writer
+
+    Raises UnsupportedTree (after removing the partial .git) when the tree
+    needs the git CLI, so callers can fall back to it.
+    """
+    writer = GitObjectWriter(project_path)
+    branch = branch or default_branch()
+    writer.init(branch, user_name, user_email, remote_url)
+    try:
+        tree, index_entries = writer.add_all()
+    except UnsupportedTree:
+        shutil.rmtree(writer.git_dir)
+        raise
+    if tree is None:
+        tree = writer.write_tree([])
+
+    author = f"{user_name} <{user_email}>"
+    commit = writer.write_commit(tree, message, author)
+    writer.update_ref(branch, commit, author, f"commit (initial): {message.splitlines()[0]}")
+    writer.write_index(index_entries)
+    return writer
+
+
+
+class TemplateObjectCache:
+    """Shared store of a template's blobs and trees, keyed by content
+
+    Blobs are looked up by the SHA-256 recorded in the TemplateIndex, so
+    syncing after a template change only writes objects for changed files.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, "objects")
+        self.map_path = os.path.join(cache_dir, "blobs.json")
+        self.blob_ids = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def has(self, sha):
+        """Whether an object is in the cache"""
+        return os.path.exists(object_path(self.objects_dir, sha))
+
+    def sync(self, index):
+        """Add blobs for indexed files not cached yet; return how many were added"""
+        with self._lock:
+            if not self._loaded:
+                os.makedirs(os.path.join(self.objects_dir, "info"), exist_ok=True)
+                try:
+                    with open(self.map_path, 'r') as f:
+                        self.blob_ids = json.load(f)
+                except (OSError, ValueError):
+                    self.blob_ids = {}
+                self._loaded = True
+
+            added = 0
+            for rel, entry in index.files.items():
+                if entry["sha256"] in self.blob_ids:
+                    continue
+                sha, raw = hash_object("blob", index.read(rel))
+                write_loose_object(self.objects_dir, sha, raw)
+                self.blob_ids[entry["sha256"]] = sha
+                added += 1
+
+            if added:
+                tmp_path = f"{self.map_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump(self.blob_ids, f)
+                os.replace(tmp_path, self.map_path)
+
+            # Template trees: only the ones not cached yet are written
+            files = {rel: (git_mode(entry["mode"]), self.blob_ids[entry["sha256"]])
+                     for rel, entry in index.files.items()}
+            build_trees(files, self._store_tree)
+            return added
+
+    def _store_tree(self, data):
+        """Write a template tree into the cache"""
+        sha, raw = hash_object("tree", data)
+        write_loose_object(self.objects_dir, sha, raw)
+        return sha
+
+
+_shared_caches = {}
+_shared_caches_lock = threading.Lock()
+
+
+def shared_object_cache(cache_dir):
+    """The one TemplateObjectCache of a cache directory in this process
+
+    Scaffolders of different templates and git backends share it, so its
+    blob map is only ever written by one instance.
+    """
+    cache_dir = os.path.abspath(cache_dir)
+    with _shared_caches_lock:
+        cache = _shared_caches.get(cache_dir)
+        if cache is None:
+            cache = _shared_caches[cache_dir] = TemplateObjectCache(cache_dir)
+        return cache
+
+
+def init_repository_from_template(project_path, user_name, user_email, remote_url, message,
+                                  index, cache, rendered=(), sharing="link", branch=None):
+    """Create the initial commit of a freshly scaffolded project from cached objects
+
+    Only rendered files are read and hashed; every other file is assumed to
+    be the indexed template content (its size is checked), and trees that
+    match the template are reused from the cache rather than rewritten.
+    """
+    if any(rel.rpartition("/")[2] == ".gitignore" for rel in index.files):
+        raise UnsupportedTree(".gitignore rules need the git CLI")
+
+    writer = GitObjectWriter(project_path)
+    branch = branch or default_branch()
+    writer.init(branch, user_name, user_email, remote_url)
+
+    rendered = set(rendered)
+    files, index_entries, shared = {}, [], []
+    for rel, entry in index.files.items():
+        st = os.lstat(os.path.join(project_path, rel))
+        mode = git_mode(st.st_mode)
+        sha = cache.blob_ids.get(entry["sha256"])
+        if rel in rendered or sha is None or st.st_size != entry["size"]:
+            with open(os.path.join(project_path, rel), 'rb') as f:
+                sha = writer.write_object("blob", f.read())
+        else:
+            shared.append(sha)
+        files[rel] = (mode, sha)
+        index_entries.append((rel, mode, sha, st))
+
+    def store_tree(data):
+        sha, raw = hash_object("tree", data)
+        if cache.has(sha):
+            shared.append(sha)
+        elif write_loose_object(writer.objects_dir, sha, raw):
+            writer.objects_written += 1
+        return sha
+
+    tree = build_trees(files, store_tree) or writer.write_tree([])
+    writer.share_objects(cache, shared, sharing)
+
+    author = f"{user_name} <{user_email}>"
+    commit = writer.write_commit(tree, message, author)
+    writer.update_ref(branch, commit, author, f"commit (initial): {message.splitlines()[0]}")
+    writer.write_index(index_entries)
+    return writer
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Scaffold Instrumentation
+Per-stage wall time and counters for project creation, written as one JSON
+trace per project; disabled (and free) unless PROJECT_SETUP_TRACE is set
+"""
+
+import json
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# "1" or "-" traces to stderr, anything else is a file that gets one JSON line per project
+TRACE_ENV = "PROJECT_SETUP_TRACE"
+
+PERCENTILES = (50, 90, 99)
+
+_local = threading.local()
+
+
+class ProjectTrace:
+    """Timings, counters and warnings of one project creation"""
+
+    enabled = True
+
+    def __init__(self, project):
+        self.project = project
+        self.stages = []
+        self.warnings = []
+        self._current = None
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """Time a stage; counters recorded meanwhile are attributed to it"""
+        record = {"stage": name}
+        self.stages.append(record)
+        outer, self._current = self._current, record
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = round(time.perf_counter() - start, 6)
+            self._current = outer
+
+    def count(self, key, amount=1):
+        """Add to a counter of the running stage"""
+        if self._current is not None:
+            self._current[key] = self._current.get(key, 0) + amount
+
+    def warn(self, message):
+        """Keep a warning that would otherwise only be printed"""
+        self.warnings.append(message)
+
+    def to_dict(self, status, error=None):
+        """JSON-ready trace"""
+        data = {"project": self.project, "status": status,
+                "seconds": round(time.perf_counter() - self._start, 6),
+                "stages": self.stages}
+        if error:
+            data["error"] = error
+        if self.warnings:
+            data["warnings"] = self.warnings
+        return data
+
+
+class _NullStage:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class NullTrace:
+    """Stand-in used when tracing is off; every call is a no-op"""
+
+    enabled = False
+    _stage = _NullStage()
+
+    def stage(self, name):
+        return self._stage
+
+    def count(self, key, amount=1):
+        pass
+
+    def warn(self, message):
+        pass
+
+
+NULL_TRACE = NullTrace()
+
+
+def current():
+    """Trace of the project being created on this thread (NULL_TRACE if none)"""
+    return getattr(_local, "trace", NULL_TRACE)
+
+
+@contextmanager
+def activate(trace):
+    """Make trace the current one for this thread"""
+    outer = current()
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        _local.trace = outer
+
+
+class Tracer:
+    """Starts project traces and writes finished ones as JSON lines"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.traces = []
+        self._lock = threading.Lock()
+
+    def start(self, project):
+        return ProjectTrace(project)
+
+    def finish(self, trace, status, error=None):
+        """Record and write a finished trace"""
+        data = trace.to_dict(status, error)
+        with self._lock:
+            self.traces.append(data)
+        self.write(data)
+        return data
+
+    def write(self, data):
+        """Append one JSON line to the trace output"""
+        line = json.dumps(data) + "\n"
+        with self._lock:
+            if self.path is None:
+                sys.stderr.write(line)
+            else:
+                with open(self.path, 'a') as f:
+                    f.write(line)
+
+
+def tracer_from_env(environ=None):
+    """Tracer configured by PROJECT_SETUP_TRACE, or None when tracing is off"""
+    value = (os.environ if environ is None else environ).get(TRACE_ENV, "")
+    if value in ("", "0"):
+        return None
+    return Tracer(None if value in ("1", "-") else value)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(traces):
+    """Percentiles of total and per-stage time plus counter sums over many traces"""
+    samples = {"total": [t["seconds"] for t in traces]}
+    counters = {}
+    for trace in traces:
+        for stage in trace["stages"]:
+            samples.setdefault(stage["stage"], []).append(stage["seconds"])
+            for key, value in stage.items():
+                if key not in ("stage", "seconds"):
+                    totals = counters.setdefault(stage["stage"], {})
+                    totals[key] = totals.get(key, 0) + value
+
+    summary = {}
+    for name, values in samples.items():
+        if not values:
+            continue
+        values.sort()
+        entry = {"count": len(values)}
+        entry.update((f"p{pct}", percentile(values, pct)) for pct in PERCENTILES)
+        entry["max"] = values[-1]
+        entry.update(counters.get(name, {}))
+        summary[name] = entry
+    return summary
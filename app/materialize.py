@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Template Materialization
+Places template files into a new project using the cheapest available
+mechanism: reflink/clonefile, hardlink, copy_file_range, sendfile or a
+plain copy, falling back down the chain when one is not supported
+"""
+
+import errno
+import os
+import stat
+import sys
+
+from template_index import TOOL_FILES
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# ioctl number for FICLONE on Linux (btrfs, XFS, overlayfs on those)
+FICLONE = 0x40049409
+
+STRATEGIES = ("reflink", "hardlink", "copy_file_range", "sendfile", "copy")
+
+# Hardlinks share the inode with the template, so an in-place edit in the
+# project would change the template too; only use them when asked for.
+DEFAULT_CHAIN = ("reflink", "copy_file_range", "sendfile", "copy")
+
+# Errors meaning "this mechanism does not work here" rather than a real failure
+UNSUPPORTED_ERRNOS = {
+    errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.ENOTTY, errno.EPERM,
+    errno.EOPNOTSUPP, getattr(errno, "ENOTSUP", errno.EOPNOTSUPP),
+    getattr(errno, "ENOTSOCK", errno.EINVAL), errno.EBADF,
+}
+
+_clonefile = None
+
+
+def _load_clonefile():
+    """Look up clonefile(2) from libc on macOS"""
+    global _clonefile
+    if _clonefile is None:
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        _clonefile = libc.clonefile
+        _clonefile.argtypes = (ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int)
+    return _clonefile
+
+
+def _reflink(src, dst, size):
+    """Share extents with the source file (copy-on-write)"""
+    if sys.platform == "darwin":
+        import ctypes
+        if _load_clonefile()(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), dst)
+        return
+    if fcntl is None:
+        raise OSError(errno.ENOSYS, "reflink not available", dst)
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+
+def _hardlink(src, dst, size):
+    """Link the template file into the project"""
+    os.link(src, dst)
+
+
+def _kernel_copy(copy_chunk, src, dst, size):
+    """Drive an in-kernel copy primitive until the whole file is transferred"""
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        offset = 0
+        while offset < size:
+            copied = copy_chunk(fsrc.fileno(), fdst.fileno(), offset, size - offset)
+            if copied == 0:
+                # Short copy (e.g. special files): let the next strategy handle it
+                raise OSError(errno.EINVAL, "Kernel copy stopped early", dst)
+            offset += copied
+
+
+def _copy_file_range(src, dst, size):
+    """Copy inside the kernel (may become a server-side copy or reflink)"""
+    if not hasattr(os, "copy_file_range"):
+        raise OSError(errno.ENOSYS, "copy_file_range not available", dst)
+    _kernel_copy(lambda fin, fout, offset, count: os.copy_file_range(fin, fout, count, offset, offset),
+                 src, dst, size)
+
+
+def _sendfile(src, dst, size):
+    """Copy with sendfile(2) to a regular file (Linux only)"""
+    if not hasattr(os, "sendfile"):
+        raise OSError(errno.ENOSYS, "sendfile not available", dst)
+    _kernel_copy(lambda fin, fout, offset, count: os.sendfile(fout, fin, offset, count),
+                 src, dst, size)
+
+
+def _copy(src, dst, size):
+    """Plain userspace copy"""
+    import shutil
+    shutil.copyfile(src, dst)
+
+
+_STRATEGY_FUNCS = {
+    "reflink": _reflink,
+    "hardlink": _hardlink,
+    "copy_file_range": _copy_file_range,
+    "sendfile": _sendfile,
+    "copy": _copy,
+}
+
+# Strategies that do not write the file's bytes again
+_SHARING = {"reflink", "hardlink"}
+
+
+def parse_chain(value):
+    """Turn 'auto' or a comma separated list into a strategy chain"""
+    if not value or value == "auto":
+        return DEFAULT_CHAIN
+    chain = tuple(name.strip() for name in value.split(",") if name.strip())
+    unknown = [name for name in chain if name not in STRATEGIES]
+    if unknown:
+        raise ValueError(f"Unknown copy mode(s): {', '.join(unknown)}")
+    # Always end with a plain copy so every file can be placed
+    return chain if chain[-1] == "copy" else chain + ("copy",)
+
+
+class TemplateMaterializer:
+    """Materialize a template directory into a project directory"""
+
+    def __init__(self, chain=DEFAULT_CHAIN):
+        self.chain = tuple(chain)
+        # Strategies that failed with an "unsupported" error are skipped
+        # for the rest of this materializer's life (same template, same target fs)
+        self.unsupported = set()
+
+    def materialize(self, template_dir, project_path, copy_paths=(), skip_paths=(), index=None):
+        """Place every template file under project_path and return statistics
+
+        Files listed in copy_paths (relative to the template) are always real,
+        independent copies because they are rewritten afterwards. Files in
+        skip_paths are left out entirely, e.g. because they are rendered.
+        With a TemplateIndex the file list comes from the index instead of a
+        directory walk.
+        """
+        must_copy = {os.path.normpath(p) for p in copy_paths}
+        skip = {os.path.normpath(p) for p in skip_paths}
+        stats = {"files": 0, "bytes_written": 0, "bytes_shared": 0, "strategies": {}}
+        dirs, files = (index.dirs, index.files) if index else walk_template(template_dir)
+
+        for rel in dirs:
+            os.makedirs(os.path.join(project_path, rel), exist_ok=True)
+
+        for rel, entry in files.items():
+            if os.path.normpath(rel) in skip:
+                continue
+            size = entry["size"]
+            chain = ("copy",) if os.path.normpath(rel) in must_copy else self.chain
+
+            strategy = self.place(os.path.join(template_dir, rel),
+                                  os.path.join(project_path, rel), size, chain)
+            stats["files"] += 1
+            stats["strategies"][strategy] = stats["strategies"].get(strategy, 0) + 1
+            if strategy in _SHARING:
+                stats["bytes_shared"] += size
+            else:
+                stats["bytes_written"] += size
+
+        # Apply directory modes last so read-only directories can still be filled
+        for rel in reversed(list(dirs)):
+            os.chmod(os.path.join(project_path, rel), dirs[rel])
+
+        return stats
+
+    def place(self, src, dst, size, chain=None):
+        """Place one file, returning the name of the strategy that worked"""
+        # shutil pulls in the compression modules; keep it off the CLI start path
+        import shutil
+
+        last_error = None
+        for name in chain or self.chain:
+            if name in self.unsupported and name != "copy":
+                continue
+            try:
+                _STRATEGY_FUNCS[name](src, dst, size)
+            except OSError as e:
+                last_error = e
+                if e.errno in UNSUPPORTED_ERRNOS:
+                    self.unsupported.add(name)
+                _remove_partial(dst)
+                continue
+            if name != "hardlink":
+                shutil.copystat(src, dst)
+            return name
+        raise last_error or OSError(errno.EIO, "No copy strategy succeeded", dst)
+
+
+def walk_template(template_dir):
+    """Walk a template into ({dir: mode}, {file: {"size", "mode"}}) like TemplateIndex"""
+    dirs, files = {}, {}
+    for root, dirnames, filenames in os.walk(template_dir, followlinks=True):
+        rel_root = os.path.relpath(root, template_dir)
+        if rel_root != ".":
+            dirs[rel_root] = stat.S_IMODE(os.stat(root).st_mode)
+        for filename in filenames:
+            rel = filename if rel_root == "." else os.path.join(rel_root, filename)
+            if rel in TOOL_FILES:
+                continue
+            st = os.stat(os.path.join(root, filename))
+            files[rel] = {"size": st.st_size, "mode": stat.S_IMODE(st.st_mode)}
+    return dirs, files
+
+
+def _remove_partial(path):
+    """Delete a half-written destination before trying the next strategy"""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
@@ -7,52 +7,73 @@ Creates new projects with Claude & Cursor integration
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import os
-import shutil
-import subprocess
-import json
-import sys
-from pathlib import Path
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from accounts import DEFAULT_CONFIG_FILE, AccountIndex
+from daemon import DaemonClient, DaemonError
+from scaffold import (
+    DEFAULT_DEVELOPER_DIR, DEFAULT_TEMPLATE_DIR, STAGES,
+    ProjectScaffolder, ScaffoldCancelled, ScaffoldError, open_registry
+)
+
+# How often the Tk loop drains progress events from the worker
+POLL_INTERVAL_MS = 50
+
+# Matches offered by the account combobox at a time; typing narrows them down
+MAX_COMBO_VALUES = 50
+
+STAGE_LABELS = {
+    "directory": "Creating directory",
+    "copy": "Copying template",
+    "customize": "Customizing files",
+    "git": "Initializing Git",
+    "publish": "Publishing project",
+    "register": "Registering repository",
+}
 
 class ProjectSetupApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Project Setup Automation")
-        self.root.geometry("400x408")
+        self.root.geometry("400x498")
         self.root.resizable(False, False)
         
         # Configuration
-        self.developer_dir = str(Path.home() / "Developer")
-        self.template_dir = str(Path.home() / "Developer" / "project-template-minimal")
-        self.config_file = "git-accounts.json"
+        self.developer_dir = DEFAULT_DEVELOPER_DIR
+        self.template_dir = DEFAULT_TEMPLATE_DIR
+        self.config_file = DEFAULT_CONFIG_FILE
         
         # Load Git accounts
+        self.registry = open_registry(self.developer_dir, self.config_file)
         self.git_accounts = self.load_git_accounts()
+        self.account_index = AccountIndex(self.git_accounts)
+        self.scaffolder = ProjectScaffolder(self.git_accounts, self.developer_dir, self.template_dir,
+                                            registry=self.registry)
+        # The window stays open across projects; see template edits made meanwhile
+        self.scaffolder.refresh_template = True
+        # A running daemon already has everything loaded; projects are created there
+        self.daemon = DaemonClient.connect(self.developer_dir)
+        # Otherwise, with PROJECT_SETUP_POOL set, skeletons are built while the user types
+        if self.daemon is None and self.scaffolder.pool is not None:
+            self.scaffolder.pool.refill_async()
+        
+        # Projects are created one at a time on a worker thread; the Tk loop only
+        # handles the events it posts, so the window never freezes
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scaffold")
+        self.events = queue.Queue()
+        self.jobs = []
+        self.last_result = ""
         
         # Create GUI
         self.create_widgets()
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+        self.root.after(POLL_INTERVAL_MS, self.poll_events)
         
     def load_git_accounts(self):
-        """Load Git accounts from configuration file"""
-        default_accounts = {
-            "freyjay": {
-                "name": "freyjay",
-                "email": "francisrey@example.com",
-                "ssh_host": "github-personal",
-                "ssh_key": "~/.ssh/id_rsa_personal"
-            }
-        }
-        
-        if os.path.exists(self.config_file):
-            try:
-                with open(self.config_file, 'r') as f:
-                    return json.load(f)
-            except:
-                return default_accounts
-        else:
-            # Create default config file
-            with open(self.config_file, 'w') as f:
-                json.dump(default_accounts, f, indent=2)
-            return default_accounts
+        """Load Git accounts from the account registry"""
+        return self.registry.accounts()
     
     def create_widgets(self):
         """Create the GUI widgets"""
@@ -87,12 +108,13 @@ class ProjectSetupApp:
         ttk.Label(main_frame, text="Which Git repository do you want it to connect to?").grid(
             row=4, column=0, sticky=tk.W, pady=(0, 5))
         
+        # Editable so typing filters the accounts by key, name or email
         self.git_account_var = tk.StringVar()
         self.git_combo = ttk.Combobox(main_frame, textvariable=self.git_account_var, 
-                                     state="readonly", width=37, font=("Arial", 12))
-        self.git_combo['values'] = list(self.git_accounts.keys())
+                                     width=37, font=("Arial", 12))
+        self.git_combo['values'] = self.account_index.keys()[:MAX_COMBO_VALUES]
         if self.git_accounts:
-            self.git_combo.set(list(self.git_accounts.keys())[0])
+            self.git_combo.set(next(iter(self.git_accounts)))
         self.git_combo.grid(row=5, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 20))
         
         # Account info display
@@ -102,21 +124,34 @@ class ProjectSetupApp:
         self.account_info_label.grid(row=6, column=0, columnspan=2, sticky=tk.W, pady=(0, 20))
         self.update_account_info()
         
+        # Progress of the running project and the queue behind it
+        self.progress_bar = ttk.Progressbar(main_frame, mode="determinate", maximum=len(STAGES))
+        self.progress_bar.grid(row=7, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 5))
+        self.status_var = tk.StringVar()
+        ttk.Label(main_frame, textvariable=self.status_var, foreground="gray",
+                  wraplength=320).grid(row=8, column=0, columnspan=2, sticky=tk.W)
+        
         # Buttons frame
         button_frame = ttk.Frame(main_frame)
-        button_frame.grid(row=7, column=0, columnspan=2, pady=(40, 0))
+        button_frame.grid(row=9, column=0, columnspan=2, pady=(20, 0))
         
         # Create project button
         self.create_btn = ttk.Button(button_frame, text="Create Project", 
                                     command=self.create_project)
         self.create_btn.pack(side=tk.LEFT, padx=(0, 10))
         
+        # Cancel button (only active while projects are running or queued)
+        self.cancel_btn = ttk.Button(button_frame, text="Cancel", 
+                                    command=self.cancel_projects, state=tk.DISABLED)
+        self.cancel_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
         # Manage accounts button
         ttk.Button(button_frame, text="Manage Git Accounts", 
                   command=self.manage_accounts).pack(side=tk.LEFT)
         
         # Bind events
         self.git_combo.bind('<<ComboboxSelected>>', self.update_account_info)
+        self.git_combo.bind('<KeyRelease>', self.filter_accounts)
         self.root.bind('<Return>', lambda e: self.create_project())
         
         # Set focus to project name entry with multiple attempts
@@ -135,208 +170,256 @@ class ProjectSetupApp:
         else:
             self.account_info_var.set("")
     
+    def filter_accounts(self, event=None):
+        """Offer the accounts matching what was typed into the combobox"""
+        if event is not None and event.keysym in ("Return", "Escape", "Up", "Down", "Tab"):
+            return
+        text = self.git_account_var.get()
+        # The full list while the text is an exact account, so it can be changed
+        matches = self.account_index.search("" if text in self.account_index else text)
+        self.git_combo['values'] = matches[:MAX_COMBO_VALUES]
+        self.update_account_info()
+    
     def create_project(self):
-        """Create the new project"""
+        """Queue the new project for creation on the worker thread"""
         project_name = self.project_name_var.get().strip()
         git_account = self.git_account_var.get()
         
-        # Validation
-        if not project_name:
-            messagebox.showerror("Error", "Please enter a project name!")
+        try:
+            self.scaffolder.validate(project_name, git_account)
+        except ScaffoldError as e:
+            messagebox.showerror("Error", str(e))
             return
-        
-        if not git_account:
-            messagebox.showerror("Error", "Please select a Git account!")
+        if any(job["name"] == project_name for job in self.jobs):
+            messagebox.showerror("Error", f"Project '{project_name}' is already queued!")
             return
         
-        # Check if project already exists
-        project_path = os.path.join(self.developer_dir, project_name)
-        if os.path.exists(project_path):
-            messagebox.showerror("Error", f"Project '{project_name}' already exists!")
-            return
+        job = {"name": project_name, "account": git_account, "cancel": threading.Event()}
+        self.jobs.append(job)
+        self.executor.submit(self.run_job, job)
+        self.cancel_btn.configure(state=tk.NORMAL)
+        self.update_status()
         
-        # Check if template exists
-        if not os.path.exists(self.template_dir):
-            messagebox.showerror("Error", f"Template directory not found:\n{self.template_dir}")
-            return
+        # Ready for the next project right away
+        self.project_name_var.set("")
+        self.project_name_entry.focus_set()
+    
+    def run_job(self, job):
+        """Create one project (worker thread); only posts events, never touches widgets"""
+        def progress(stage, step, total):
+            self.events.put(("progress", job, (stage, step, total)))
         
         try:
-            # Create project directory
-            os.makedirs(project_path)
-            
-            # Copy template files
-            self.copy_template_files(project_path)
-            
-            # Customize files with project info
-            self.customize_files(project_path, project_name, git_account)
-            
-            # Add project to allowed repositories list
-            self.add_project_to_allowed_repos(project_name)
-            
-            # Initialize Git repository
-            self.initialize_git(project_path, git_account)
-            
-            # Success message
-            messagebox.showinfo("Success", 
-                              f"Project '{project_name}' created successfully!\n\n"
-                              f"Location: {project_path}\n\n"
-                              f"Next steps:\n"
-                              f"1. Open in Cursor: cursor .\n"
-                              f"2. Start developing!")
-            
-            # Close app and terminal after success message
-            self.root.quit()
-            self.root.destroy()
-            
-            # Note: Terminal window will remain open - user can close manually if desired
-            # This avoids requiring accessibility permissions for automated UI control
-            
-            sys.exit(0)
-            
+            project_path = None
+            if self.daemon is not None:
+                try:
+                    project_path = self.daemon.create_project(job["name"], job["account"],
+                                                              progress=progress,
+                                                              cancel=job["cancel"])
+                except DaemonError:
+                    # The daemon went away; carry on in-process, unless it got as far as
+                    # publishing (an atomic rename, so a project at the path is complete)
+                    self.daemon = None
+                    if os.path.isdir(self.scaffolder.project_path(job["name"])):
+                        project_path = self.scaffolder.project_path(job["name"])
+            if project_path is None:
+                project_path = self.scaffolder.create_project(job["name"], job["account"],
+                                                              progress=progress,
+                                                              cancel=job["cancel"])
+        except ScaffoldCancelled:
+            self.events.put(("cancelled", job, None))
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to create project:\n{str(e)}")
+            self.events.put(("failed", job, str(e)))
+        else:
+            self.events.put(("done", job, project_path))
     
-    def add_project_to_allowed_repos(self, project_name):
-        """Add new project to the allowed repositories list"""
-        git_accounts_file = os.path.join(self.developer_dir, ".git-accounts")
-        if os.path.exists(git_accounts_file):
-            try:
-                with open(git_accounts_file, 'r') as f:
-                    content = f.read()
-                
-                # Find the freyjay line and add the new project
-                lines = content.split('\n')
-                for i, line in enumerate(lines):
-                    if line.startswith('freyjay|'):
-                        # Add the new project to the repositories list
-                        if project_name not in line:
-                            # Remove the trailing part and add the new project
-                            parts = line.split('|')
-                            if len(parts) >= 5:
-                                repos = parts[4].split(',')
-                                if project_name not in repos:
-                                    repos.append(project_name)
-                                    parts[4] = ','.join(repos)
-                                    lines[i] = '|'.join(parts)
-                
-                # Write back the updated content
-                with open(git_accounts_file, 'w') as f:
-                    f.write('\n'.join(lines))
-                    
-            except Exception as e:
-                print(f"Warning: Could not update allowed repositories: {e}")
-    
-    def copy_template_files(self, project_path):
-        """Copy template files to new project"""
-        # Copy all files and directories from template
-        for item in os.listdir(self.template_dir):
-            src = os.path.join(self.template_dir, item)
-            dst = os.path.join(project_path, item)
-            
-            if os.path.isdir(src):
-                shutil.copytree(src, dst)
-            else:
-                shutil.copy2(src, dst)
-    
-    def customize_files(self, project_path, project_name, git_account):
-        """Customize files with project-specific information"""
-        account = self.git_accounts[git_account]
-        
-        # Files to customize
-        files_to_customize = [
-            "CLAUDE.md",
-            "README.md", 
-            ".cursorrules",
-            "config/commands.md",
-            "config/stack.md",
-            "config/environment.md"
-        ]
-        
-        for filename in files_to_customize:
-            filepath = os.path.join(project_path, filename)
-            if os.path.exists(filepath):
-                # Read file content
-                with open(filepath, 'r') as f:
-                    content = f.read()
-                
-                # Replace placeholders
-                content = content.replace("[PROJECT_NAME]", project_name)
-                content = content.replace("[PROJECT_DESCRIPTION]", f"{project_name} - A new project")
-                content = content.replace("[REPOSITORY_URL]", f"git@{account['ssh_host']}:{account['name']}/{project_name}.git")
-                content = content.replace("[PACKAGE_MANAGER]", "npm")
-                content = content.replace("[DEV_COMMAND]", "npm run dev")
-                content = content.replace("[LANGUAGE]", "JavaScript/TypeScript")
-                content = content.replace("[RUNTIME]", "Node.js")
+    def poll_events(self):
+        """Apply the worker's progress events to the widgets"""
+        try:
+            while True:
+                kind, job, data = self.events.get_nowait()
+                if kind == "progress":
+                    stage, step, total = data
+                    self.progress_bar.configure(value=step)
+                    if not job["cancel"].is_set():
+                        job["stage"] = STAGE_LABELS.get(stage, stage)
+                    self.update_status()
+                    continue
                 
-                # Write back
-                with open(filepath, 'w') as f:
-                    f.write(content)
+                self.jobs.remove(job)
+                if kind == "done":
+                    self.last_result = (f"✅ '{job['name']}' created at {data}\n"
+                                        f"Next: cd {data} && cursor .")
+                elif kind == "cancelled":
+                    self.last_result = f"Cancelled '{job['name']}'"
+                else:
+                    self.last_result = f"❌ '{job['name']}' failed"
+                    messagebox.showerror("Error", f"Failed to create project '{job['name']}':\n{data}")
+                self.progress_bar.configure(value=0 if self.jobs else self.progress_bar["maximum"])
+                self.update_status()
+        except queue.Empty:
+            pass
+        
+        if not self.jobs:
+            self.cancel_btn.configure(state=tk.DISABLED)
+        self.root.after(POLL_INTERVAL_MS, self.poll_events)
     
-    def initialize_git(self, project_path, git_account):
-        """Initialize Git repository with proper error handling"""
-        account = self.git_accounts[git_account]
-        
-        # Change to project directory
-        original_dir = os.getcwd()
-        os.chdir(project_path)
-        
-        try:
-            # Initialize Git (no check=True to avoid crashes)
-            subprocess.run(["git", "init"], capture_output=True)
-            
-            # Set Git configuration
-            subprocess.run(["git", "config", "user.name", account['name']], capture_output=True)
-            subprocess.run(["git", "config", "user.email", account['email']], capture_output=True)
-            
-            # Add remote origin
-            remote_url = f"git@{account['ssh_host']}:{account['name']}/{self.project_name_var.get()}.git"
-            subprocess.run(["git", "remote", "add", "origin", remote_url], capture_output=True)
-            
-            # Check if there are files to commit
-            result = subprocess.run(["git", "status", "--porcelain"], capture_output=True, text=True)
-            if result.stdout.strip():  # Only commit if there are changes
-                subprocess.run(["git", "add", "."], capture_output=True)
-                commit_result = subprocess.run(["git", "commit", "-m", "Initial setup: Claude & Cursor environment"], 
-                                             capture_output=True, text=True)
-                if commit_result.returncode != 0:
-                    print(f"Git commit warning: {commit_result.stderr}")
-            else:
-                # Create a placeholder file if no files exist
-                with open("README.md", "w") as f:
-                    f.write(f"# {self.project_name_var.get()}\n\nInitial project setup.")
-                subprocess.run(["git", "add", "."], capture_output=True)
-                commit_result = subprocess.run(["git", "commit", "-m", "Initial setup: Claude & Cursor environment"], 
-                                             capture_output=True, text=True)
-                if commit_result.returncode != 0:
-                    print(f"Git commit warning: {commit_result.stderr}")
-            
-        except Exception as e:
-            # If any Git operations fail, don't crash the app
-            print(f"Git initialization warning: {e}")
-            # Continue without Git setup - project is still created
-        finally:
-            os.chdir(original_dir)
+    def update_status(self):
+        """Show the running project's stage, the queue length and the last result"""
+        lines = []
+        if self.jobs:
+            current = self.jobs[0]
+            lines.append(f"{current.get('stage', 'Waiting')}: {current['name']}")
+            if len(self.jobs) > 1:
+                lines.append(f"{len(self.jobs) - 1} more queued")
+        if self.last_result:
+            lines.append(self.last_result)
+        self.status_var.set("\n".join(lines))
+    
+    def cancel_projects(self):
+        """Cancel the running project (it is rolled back) and everything queued"""
+        for job in self.jobs:
+            job["cancel"].set()
+            job["stage"] = "Cancelling"
+        self.update_status()
+    
+    def close(self):
+        """Cancel outstanding work, wait for the rollback and quit"""
+        if self.jobs and not messagebox.askyesno(
+                "Confirm", "Projects are still being created. Cancel them and quit?"):
+            return
+        self.cancel_projects()
+        self.executor.shutdown(wait=True)
+        self.root.destroy()
     
     def manage_accounts(self):
         """Open account management window"""
-        AccountManagerWindow(self.root, self.git_accounts, self.config_file)
-        # Reload accounts after potential changes
-        self.git_accounts = self.load_git_accounts()
-        self.git_combo['values'] = list(self.git_accounts.keys())
-        if self.git_accounts:
-            self.git_combo.set(list(self.git_accounts.keys())[0])
-        self.update_account_info()
+        AccountManagerWindow(self.root, self.git_accounts, self.registry,
+                             on_save=self.accounts_saved)
+    
+    def accounts_saved(self, accounts):
+        """Apply the account manager's changes, touching only the accounts that changed"""
+        for key in self.git_accounts.keys() - accounts.keys():
+            self.account_index.remove(key)
+        for key, account in accounts.items():
+            if self.git_accounts.get(key) != account:
+                self.account_index.set(key, account)
+        self.git_accounts = accounts
+        self.scaffolder.git_accounts = accounts
+        if self.git_account_var.get() not in accounts:
+            self.git_combo.set(next(iter(accounts), ""))
+        self.filter_accounts()
+
+
+class VirtualListbox(ttk.Frame):
+    """Listbox that only ever holds its visible rows, so its length does not matter
+
+    items is a list of keys shown in order; format_row(key) gives a row's text.
+    Scrolling, the scrollbar and the arrow keys move a window over the list.
+    """
+    
+    def __init__(self, parent, format_row, height=8, width=50):
+        super().__init__(parent)
+        self.format_row = format_row
+        self.height = height
+        self.items = []
+        self.offset = 0
+        self.selected = None
+        
+        self.listbox = tk.Listbox(self, height=height, width=width, exportselection=False,
+                                  activestyle="none")
+        self.listbox.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.scroll)
+        self.scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.columnconfigure(0, weight=1)
+        
+        self.listbox.bind("<<ListboxSelect>>", self.on_select)
+        self.listbox.bind("<MouseWheel>", lambda e: self.scroll_units(-1 if e.delta > 0 else 1))
+        self.listbox.bind("<Button-4>", lambda e: self.scroll_units(-1))
+        self.listbox.bind("<Button-5>", lambda e: self.scroll_units(1))
+        self.listbox.bind("<Up>", lambda e: self.move_selection(-1))
+        self.listbox.bind("<Down>", lambda e: self.move_selection(1))
+        self.listbox.bind("<Prior>", lambda e: self.move_selection(-height))
+        self.listbox.bind("<Next>", lambda e: self.move_selection(height))
+    
+    def set_items(self, items):
+        """Show a new list (kept by reference, not copied)"""
+        self.items = items
+        self.offset = max(0, min(self.offset, len(items) - self.height))
+        self.render()
+    
+    def render(self):
+        """Rebuild the visible rows only"""
+        rows = self.items[self.offset:self.offset + self.height]
+        self.listbox.delete(0, tk.END)
+        if rows:
+            self.listbox.insert(0, *[self.format_row(key) for key in rows])
+        if self.selected in rows:
+            self.listbox.selection_set(rows.index(self.selected))
+        total = len(self.items)
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.height) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+    
+    def scroll(self, action, amount, unit=None):
+        """Scrollbar command ("moveto" fraction or "scroll" units/pages)"""
+        if action == "moveto":
+            self.offset = int(float(amount) * len(self.items))
+        else:
+            self.offset += int(amount) * (self.height if unit == "pages" else 1)
+        self.offset = max(0, min(self.offset, len(self.items) - self.height))
+        self.render()
+    
+    def scroll_units(self, units):
+        self.scroll("scroll", units, "units")
+        return "break"
+    
+    def on_select(self, event=None):
+        selection = self.listbox.curselection()
+        if selection and self.offset + selection[0] < len(self.items):
+            self.selected = self.items[self.offset + selection[0]]
+    
+    def select(self, key, position=None):
+        """Select a key and scroll it into view (position avoids a search if known)"""
+        self.selected = key
+        if position is None:
+            try:
+                position = self.items.index(key)
+            except ValueError:
+                position = None
+        if position is not None:
+            if position < self.offset:
+                self.offset = position
+            elif position >= self.offset + self.height:
+                self.offset = position - self.height + 1
+        self.render()
+    
+    def move_selection(self, delta):
+        """Arrow/page keys: move the selection, scrolling as needed"""
+        if not self.items:
+            return "break"
+        visible = self.items[self.offset:self.offset + self.height]
+        if self.selected in visible:
+            position = self.offset + visible.index(self.selected)
+        else:
+            position = self.offset - 1 if delta > 0 else self.offset + len(visible)
+        position = max(0, min(position + delta, len(self.items) - 1))
+        self.select(self.items[position], position)
+        return "break"
 
 
 class AccountManagerWindow:
-    def __init__(self, parent, accounts, config_file):
+    def __init__(self, parent, accounts, registry, on_save=None):
         self.window = tk.Toplevel(parent)
         self.window.title("Manage Git Accounts")
-        self.window.geometry("600x400")
+        self.window.geometry("600x440")
         self.window.resizable(False, False)
         
         self.accounts = accounts.copy()
-        self.config_file = config_file
+        self.index = AccountIndex(self.accounts)
+        self.registry = registry
+        self.on_save = on_save
         
         self.create_widgets()
     
@@ -351,28 +434,45 @@ class AccountManagerWindow:
                                font=("Arial", 14, "bold"))
         title_label.grid(row=0, column=0, columnspan=2, pady=(0, 20))
         
-        # Accounts list
+        # Type-ahead filter over account keys, names and emails
         ttk.Label(main_frame, text="Current Accounts:").grid(row=1, column=0, sticky=tk.W)
-        
-        # Listbox for accounts
-        self.accounts_listbox = tk.Listbox(main_frame, height=8, width=50)
-        self.accounts_listbox.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(main_frame, textvariable=self.search_var, width=30)
+        search_entry.grid(row=1, column=1, sticky=tk.E, pady=(0, 5))
+        self.search_var.trace_add("write", lambda *args: self.update_accounts_list())
+        
+        # Only the visible rows are ever in the list widget
+        self.accounts_list = VirtualListbox(
+            main_frame, lambda key: f"{key} ({self.accounts[key]['email']})", height=8, width=50)
+        self.accounts_list.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
+        self.accounts_list.listbox.bind("<Double-Button-1>", lambda e: self.edit_account())
+        self.count_var = tk.StringVar()
+        ttk.Label(main_frame, textvariable=self.count_var, foreground="gray").grid(
+            row=3, column=0, columnspan=2, sticky=tk.W)
         self.update_accounts_list()
         
         # Buttons
         button_frame = ttk.Frame(main_frame)
-        button_frame.grid(row=3, column=0, columnspan=2, pady=(10, 0))
+        button_frame.grid(row=4, column=0, columnspan=2, pady=(10, 0))
         
         ttk.Button(button_frame, text="Add Account", command=self.add_account).pack(side=tk.LEFT, padx=(0, 10))
         ttk.Button(button_frame, text="Edit Account", command=self.edit_account).pack(side=tk.LEFT, padx=(0, 10))
         ttk.Button(button_frame, text="Remove Account", command=self.remove_account).pack(side=tk.LEFT, padx=(0, 10))
         ttk.Button(button_frame, text="Save & Close", command=self.save_and_close).pack(side=tk.LEFT)
+        search_entry.focus_set()
     
     def update_accounts_list(self):
-        """Update the accounts listbox"""
-        self.accounts_listbox.delete(0, tk.END)
-        for name, account in self.accounts.items():
-            self.accounts_listbox.insert(tk.END, f"{name} ({account['email']})")
+        """Show the accounts matching the filter"""
+        matches = self.index.search(self.search_var.get())
+        self.accounts_list.set_items(matches)
+        shown = f"{len(matches)} of {len(self.index)}" if self.search_var.get().strip() \
+            else f"{len(self.index)}"
+        self.count_var.set(f"{shown} accounts")
+    
+    def selected_account(self):
+        """Key of the selected account, or None"""
+        key = self.accounts_list.selected
+        return key if key in self.accounts else None
     
     def add_account(self):
         """Add a new account"""
@@ -380,20 +480,20 @@ class AccountManagerWindow:
     
     def edit_account(self):
         """Edit selected account"""
-        selection = self.accounts_listbox.curselection()
-        if selection:
-            account_name = list(self.accounts.keys())[selection[0]]
+        account_name = self.selected_account()
+        if account_name is not None:
             self.show_account_dialog(account_name)
         else:
             messagebox.showwarning("Warning", "Please select an account to edit!")
     
     def remove_account(self):
         """Remove selected account"""
-        selection = self.accounts_listbox.curselection()
-        if selection:
-            account_name = list(self.accounts.keys())[selection[0]]
+        account_name = self.selected_account()
+        if account_name is not None:
             if messagebox.askyesno("Confirm", f"Remove account '{account_name}'?"):
                 del self.accounts[account_name]
+                self.index.remove(account_name)
+                self.accounts_list.selected = None
                 self.update_accounts_list()
         else:
             messagebox.showwarning("Warning", "Please select an account to edit!")
@@ -439,6 +539,7 @@ class AccountManagerWindow:
             # Remove old account if editing
             if account_name and account_name != name:
                 del self.accounts[account_name]
+                self.index.remove(account_name)
             
             # Add/update account
             self.accounts[name] = {
@@ -447,8 +548,10 @@ class AccountManagerWindow:
                 'ssh_host': ssh_host,
                 'ssh_key': ssh_key
             }
+            self.index.set(name, self.accounts[name])
             
             self.update_accounts_list()
+            self.accounts_list.select(name)
             dialog.destroy()
         
         # Save button
@@ -457,8 +560,9 @@ class AccountManagerWindow:
     def save_and_close(self):
         """Save accounts and close window"""
         try:
-            with open(self.config_file, 'w') as f:
-                json.dump(self.accounts, f, indent=2)
+            self.registry.save_accounts(self.accounts)
+            if self.on_save is not None:
+                self.on_save(self.accounts)
             self.window.destroy()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save accounts:\n{str(e)}")
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Project Pool
+Pre-materialized, git-initialized project skeletons kept under the state
+folder, so creating a project only personalizes one and renames it into place
+"""
+
+import os
+import threading
+
+from staging import process_alive
+from template_index import template_version
+
+# Number of skeletons to keep ready; 0 (the default) disables the pool
+POOL_ENV = "PROJECT_SETUP_POOL"
+
+READY_PREFIX = "ready-"
+BUILDING_PREFIX = "building-"
+
+
+def pool_size_from_env(environ=None):
+    """Pool size configured by PROJECT_SETUP_POOL"""
+    value = (os.environ if environ is None else environ).get(POOL_ENV, "")
+    try:
+        return max(0, int(value))
+    except ValueError:
+        return 0
+
+
+class ProjectPool:
+    """Skeletons of one scaffolder's template and git backend
+
+    A skeleton has every template file except the customizable ones that
+    contain placeholders, and (with the subprocess git backend) an
+    initialized repository with those files already staged. Skeletons are
+    built under a "building-" name and renamed to "ready-" when complete,
+    and claimed by renaming them to a project's build path, so concurrent
+    claimers, including other processes, never get the same one.
+    """
+
+    def __init__(self, scaffolder, pool_dir, size):
+        self.scaffolder = scaffolder
+        self.pool_dir = pool_dir
+        self.size = size
+        self._lock = threading.Lock()
+        self._refill_thread = None
+
+    def render_paths(self):
+        """Files left out of skeletons because claiming renders them"""
+        index = self.scaffolder.template_index()
+        return [rel for rel in self.scaffolder.customize_paths if index.placeholder_names(rel)]
+
+    def skeleton_dir(self):
+        """Directory of the skeletons matching the current template and git backend"""
+        index = self.scaffolder.template_index()
+        version = template_version(index.files)
+        return os.path.join(self.pool_dir, index.source,
+                            f"{version[:16]}-{self.scaffolder.git_backend}")
+
+    def ready(self):
+        """Paths of the skeletons ready to be claimed"""
+        directory = self.skeleton_dir()
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return []
+        return [os.path.join(directory, name) for name in sorted(names)
+                if name.startswith(READY_PREFIX)]
+
+    def claim(self, build_path):
+        """Move a ready skeleton to build_path; False when none could be claimed"""
+        for skeleton in self.ready():
+            try:
+                os.rename(skeleton, build_path)
+                return True
+            except FileNotFoundError:
+                # Claimed by someone else in the meantime
+                continue
+            except OSError:
+                # E.g. the pool is on another filesystem than the project
+                return False
+        return False
+
+    def fill(self):
+        """Build skeletons until the pool is full; return how many were built"""
+        with self._lock:
+            self.prune()
+            built = 0
+            while len(self.ready()) < self.size:
+                self._build()
+                built += 1
+            return built
+
+    def refill_async(self):
+        """Top the pool up on a background thread (at most one at a time)"""
+        with self._lock:
+            if self._refill_thread is not None and self._refill_thread.is_alive():
+                return self._refill_thread
+            self._refill_thread = threading.Thread(target=self._refill, name="project-pool",
+                                                   daemon=True)
+            self._refill_thread.start()
+            return self._refill_thread
+
+    def _refill(self):
+        try:
+            self.fill()
+        except Exception as e:
+            print(f"Warning: Could not refill the project pool: {e}")
+
+    def _build(self):
+        """Create one skeleton"""
+        import shutil
+
+        directory = self.skeleton_dir()
+        os.makedirs(directory, exist_ok=True)
+        token = os.urandom(6).hex()
+        path = os.path.join(directory, f"{BUILDING_PREFIX}{os.getpid()}-{token}")
+        os.makedirs(path)
+        try:
+            self.scaffolder.copy_template_files(path, skip_paths=self.render_paths())
+            self.scaffolder.prepare_pooled_git(path)
+            os.rename(path, os.path.join(directory, f"{READY_PREFIX}{token}"))
+        except BaseException:
+            shutil.rmtree(path, ignore_errors=True)
+            raise
+
+    def prune(self):
+        """Remove skeletons of outdated template versions and builds abandoned by dead processes"""
+        import shutil
+
+        current = self.skeleton_dir()
+        template_dir, name = os.path.split(current)
+        backend = name.partition("-")[2]
+        try:
+            names = os.listdir(template_dir)
+        except FileNotFoundError:
+            return
+        for name in names:
+            path = os.path.join(template_dir, name)
+            if path != current:
+                # Other git backends keep their own skeletons of the same template
+                if name.partition("-")[2] == backend:
+                    shutil.rmtree(path, ignore_errors=True)
+                continue
+            for skeleton in os.listdir(path):
+                if not skeleton.startswith(BUILDING_PREFIX):
+                    continue
+                pid = skeleton[len(BUILDING_PREFIX):].partition("-")[0]
+                if pid.isdigit() and not process_alive(int(pid)):
+                    shutil.rmtree(os.path.join(path, skeleton), ignore_errors=True)
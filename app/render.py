@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Placeholder Rendering
+Compiles a set of [PLACEHOLDER] values into one regex and substitutes them
+in a single streaming pass over each file, or splices them in at offsets
+recorded by the template index
+"""
+
+import os
+import re
+import stat
+
+# Anything that looks like a template placeholder, e.g. [PROJECT_NAME]
+PLACEHOLDER_PATTERN = re.compile(rb"\[([A-Z][A-Z0-9_]*)\]")
+
+CHUNK_SIZE = 1024 * 1024
+
+# Longest placeholder token looked for across chunk boundaries while scanning
+MAX_TOKEN = 128
+
+
+def scan_file(path, chunk_size=CHUNK_SIZE):
+    """Hash a file and locate its placeholders in one pass
+
+    Returns (sha256 hex digest, {name: [byte offsets]}).
+    """
+    import hashlib
+
+    digest = hashlib.sha256()
+    locations = {}
+    carry = b""
+    consumed = 0
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            buf = carry + chunk
+            base = consumed - len(carry)
+            consumed += len(chunk)
+            for match in PLACEHOLDER_PATTERN.finditer(buf):
+                locations.setdefault(match.group(1).decode(), []).append(base + match.start())
+            # Keep an unterminated "[..." tail so tokens split across chunks are seen
+            start = buf.rfind(b"[")
+            tail = buf[start:] if start != -1 else b""
+            carry = tail if b"]" not in tail and len(tail) < MAX_TOKEN else b""
+    return digest.hexdigest(), locations
+
+
+class PlaceholderRenderer:
+    """Single-pass substitution of [KEY] tokens with their values"""
+
+    def __init__(self, values):
+        self.values = {}
+        for key, value in values.items():
+            if "[" in key or "]" in key:
+                raise ValueError(f"Invalid placeholder name: {key!r}")
+            self.values[f"[{key}]".encode()] = str(value).encode()
+        self.keys = frozenset(values)
+        # Longest tokens first so a key can never shadow a longer one
+        tokens = sorted(self.values, key=len, reverse=True)
+        self.pattern = re.compile(b"|".join(re.escape(t) for t in tokens)) if tokens else None
+        self.max_token = max((len(t) for t in tokens), default=0)
+
+    def render_bytes(self, data):
+        """Substitute every placeholder in a bytes object"""
+        if self.pattern is None:
+            return data
+        return self.pattern.sub(lambda m: self.values[m.group(0)], data)
+
+    def render_stream(self, src, dst, chunk_size=CHUNK_SIZE):
+        """Copy src to dst file objects, substituting placeholders chunk by chunk"""
+        carry = b""
+        while True:
+            chunk = src.read(chunk_size)
+            if not chunk:
+                break
+            buf = carry + chunk
+            # A token cut by the chunk boundary can only start at the last "["
+            # (keys contain no brackets) and is shorter than the longest token
+            start = buf.rfind(b"[")
+            if start != -1 and len(buf) - start < self.max_token:
+                buf, carry = buf[:start], buf[start:]
+            else:
+                carry = b""
+            dst.write(self.render_bytes(buf))
+        dst.write(self.render_bytes(carry))
+
+    def render_file(self, src_path, dst_path, chunk_size=CHUNK_SIZE):
+        """Render a template file into a new file, keeping its permissions"""
+        with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+            self.render_stream(src, dst, chunk_size)
+        _copy_mode(src_path, dst_path)
+
+    def render_spliced(self, src_path, dst_path, locations, size, mtime_ns,
+                       chunk_size=CHUNK_SIZE):
+        """Render using precomputed placeholder offsets instead of scanning
+
+        locations maps names to byte offsets as returned by scan_file; size and
+        mtime_ns are the file's stat values they were computed for. If the file
+        no longer matches either, the index is stale and the file is scanned
+        normally instead.
+        """
+        with open(src_path, 'rb') as src:
+            st = os.fstat(src.fileno())
+            stale = st.st_size != size or st.st_mtime_ns != mtime_ns
+            if not stale:
+                self._splice(src, dst_path, locations, size, chunk_size)
+        if stale:
+            return self.render_file(src_path, dst_path, chunk_size)
+        _copy_mode(src_path, dst_path)
+
+    def render_buffer(self, data, dst_path, locations, mode):
+        """Render in-memory template content (e.g. a slice of a compiled template)
+
+        locations are the recorded placeholder offsets into data; the
+        untouched stretches are written straight from the buffer.
+        """
+        view = memoryview(data)
+        with open(dst_path, 'wb') as dst:
+            position = 0
+            for offset, token in self._splices(locations):
+                dst.write(view[position:offset])
+                dst.write(self.values[token])
+                position = offset + len(token)
+            dst.write(view[position:])
+        os.chmod(dst_path, mode)
+
+    def _splices(self, locations):
+        """(offset, token) of every placeholder this renderer has a value for, in order"""
+        return sorted((offset, f"[{name}]".encode()) for name, offsets in locations.items()
+                      if f"[{name}]".encode() in self.values for offset in offsets)
+
+    def _splice(self, src, dst_path, locations, size, chunk_size):
+        """Write src to dst_path, replacing the tokens at the given offsets"""
+        with open(dst_path, 'wb') as dst:
+            position = 0
+            for offset, token in self._splices(locations):
+                _copy_range(src, dst, offset - position, chunk_size)
+                dst.write(self.values[token])
+                src.seek(len(token), os.SEEK_CUR)
+                position = offset + len(token)
+            _copy_range(src, dst, size - position, chunk_size)
+
+
+def _copy_mode(src_path, dst_path):
+    """Give the rendered file the template file's permission bits"""
+    os.chmod(dst_path, stat.S_IMODE(os.stat(src_path).st_mode))
+
+
+def _copy_range(src, dst, count, chunk_size):
+    """Copy count bytes from the current position of src to dst"""
+    while count > 0:
+        chunk = src.read(min(count, chunk_size))
+        if not chunk:
+            break
+        dst.write(chunk)
+        count -= len(chunk)
@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+"""
+Project Scaffolding Core
+Creates projects from the template without any GUI dependency
+"""
+
+import os
+import threading
+
+from accounts import DEFAULT_CONFIG_FILE, AccountRegistry
+from instrument import NULL_TRACE, activate, current, tracer_from_env
+from materialize import TemplateMaterializer
+from project_pool import ProjectPool, pool_size_from_env
+from staging import StagingArea, sync_tree
+from template_index import PACK_SUFFIX, TemplateIndex, template_version
+
+DEFAULT_DEVELOPER_DIR = os.path.join(os.path.expanduser("~"), "Developer")
+DEFAULT_TEMPLATE_DIR = os.path.join(DEFAULT_DEVELOPER_DIR, "project-template-minimal")
+
+# Shared tool state (caches, registries) kept inside the developer directory
+STATE_DIRNAME = ".project-setup"
+
+# Files to customize (only those that actually contain placeholders are rendered)
+CUSTOMIZE_FILES = [
+    "CLAUDE.md",
+    "README.md",
+    ".cursorrules",
+    "config/commands.md",
+    "config/stack.md",
+    "config/environment.md"
+]
+
+COMMIT_MESSAGE = "Initial setup: Claude & Cursor environment"
+
+# "subprocess" runs the git CLI; "objects" writes the repository in-process
+GIT_BACKENDS = ("subprocess", "objects")
+
+# Stages of create_project, in the order they are reported to progress callbacks
+STAGES = ("directory", "copy", "customize", "git", "publish", "register")
+
+# Long-lived front-ends stat only the template's directories before each project;
+# a full walk (which also sees in-place edits) happens at most this often
+TEMPLATE_RECHECK_SECONDS = 60
+
+
+class ScaffoldError(Exception):
+    """Raised when a project cannot be created"""
+
+
+class ScaffoldCancelled(ScaffoldError):
+    """Raised when a project creation was cancelled (the partial project is removed)"""
+
+
+def open_registry(developer_dir=DEFAULT_DEVELOPER_DIR, config_file=DEFAULT_CONFIG_FILE):
+    """Account/repository registry kept in the developer directory's state folder"""
+    return AccountRegistry.for_developer_dir(
+        developer_dir, os.path.join(developer_dir, STATE_DIRNAME), config_file)
+
+
+def _warn(message):
+    """Print a warning and keep it in the current project's trace"""
+    print(message)
+    current().warn(message)
+
+
+def open_template_registry(developer_dir=DEFAULT_DEVELOPER_DIR, templates_dir=None,
+                           compiled_dir=None, persist=True):
+    """Layered templates (next to the default template unless given), compiled into the state folder"""
+    from template_registry import TemplateRegistry
+    return TemplateRegistry(templates_dir or os.path.dirname(DEFAULT_TEMPLATE_DIR),
+                            compiled_dir or os.path.join(developer_dir, STATE_DIRNAME, "compiled"),
+                            persist)
+
+
+def remote_url(account, project_name):
+    """Build the SSH remote URL for a project"""
+    return f"git@{account['ssh_host']}:{account['name']}/{project_name}.git"
+
+
+def default_placeholders(project_name, account, placeholders=None, template_defaults=None):
+    """Resolve placeholder values: built-in defaults < template layers < account < per-project"""
+    values = {
+        "PROJECT_NAME": project_name,
+        "PROJECT_DESCRIPTION": f"{project_name} - A new project",
+        "REPOSITORY_URL": remote_url(account, project_name),
+        "PACKAGE_MANAGER": "npm",
+        "LANGUAGE": "JavaScript/TypeScript",
+        "RUNTIME": "Node.js"
+    }
+    values.update(template_defaults or {})
+    values.update(account.get("placeholders") or {})
+    values.update(placeholders or {})
+    # Follow the package manager unless a dev command was given explicitly
+    values.setdefault("DEV_COMMAND", f"{values['PACKAGE_MANAGER']} run dev")
+    return values
+
+
+class ProjectScaffolder:
+    """Copy, customize and git-initialize projects from a template"""
+
+    def __init__(self, git_accounts, developer_dir=DEFAULT_DEVELOPER_DIR,
+                 template_dir=DEFAULT_TEMPLATE_DIR, materializer=None,
+                 customize_paths=CUSTOMIZE_FILES, git_backend="subprocess",
+                 object_sharing="link", registry=None, pool_size=None, durable=True):
+        self.git_accounts = git_accounts
+        self.developer_dir = developer_dir
+        self.template_dir = template_dir
+        self.materializer = materializer or TemplateMaterializer()
+        self.customize_paths = customize_paths
+        self._registry = registry
+        # Batch runs turn this off and export the legacy file once at the end
+        self.export_allowed_repos = True
+        # Dry runs turn this off: the template index is then built in memory only
+        self.save_template_index = True
+        # Long-lived front-ends turn this on to recheck the template before each project
+        self.refresh_template = False
+        if git_backend not in GIT_BACKENDS:
+            raise ValueError(f"Unknown git backend: {git_backend}")
+        self.git_backend = git_backend
+        # Template blobs/trees are pre-built once and shared into every new repository
+        self.object_sharing = object_sharing
+        self._object_cache = None
+        self._template_store = None
+        self._index = None
+        self._index_lock = threading.Lock()
+        # None unless PROJECT_SETUP_TRACE is set; then every project writes a JSON trace
+        self.tracer = tracer_from_env()
+        # Projects are built here and renamed into place once complete
+        self.staging = StagingArea(os.path.join(developer_dir, STATE_DIRNAME, "staging"))
+        # Flush each project's files to disk right before it is published; batch runs
+        # turn this off and flush the filesystem once at the end
+        self.durable = durable
+        # Pre-built project skeletons (PROJECT_SETUP_POOL of them unless pool_size is given)
+        if pool_size is None:
+            pool_size = pool_size_from_env()
+        self.pool = ProjectPool(self, os.path.join(developer_dir, STATE_DIRNAME, "pool"),
+                                pool_size) if pool_size else None
+
+    @property
+    def registry(self):
+        """Account registry, opened on first use (dry runs never open it)"""
+        with self._index_lock:
+            if self._registry is None:
+                self._registry = open_registry(self.developer_dir)
+            return self._registry
+
+    def project_path(self, project_name):
+        """Return the final location of a project"""
+        return os.path.join(self.developer_dir, project_name)
+
+    def validate(self, project_name, git_account):
+        """Check that a project can be created, raising ScaffoldError if not"""
+        if not project_name:
+            raise ScaffoldError("Please enter a project name!")
+
+        # Names come from the GUI, manifests and the daemon socket: keep them inside developer_dir
+        separators = [sep for sep in (os.sep, os.altsep) if sep]
+        if (project_name.startswith(".") or ".." in project_name
+                or any(sep in project_name for sep in separators)):
+            raise ScaffoldError(f"Invalid project name '{project_name}'!")
+
+        if not git_account:
+            raise ScaffoldError("Please select a Git account!")
+
+        if git_account not in self.git_accounts:
+            raise ScaffoldError(f"Unknown Git account '{git_account}'!")
+
+        # Check if project already exists
+        if os.path.exists(self.project_path(project_name)):
+            raise ScaffoldError(f"Project '{project_name}' already exists!")
+
+        # Check if template exists
+        if not os.path.exists(self.template_dir):
+            raise ScaffoldError(f"Template directory not found:\n{self.template_dir}")
+
+    def template_index(self):
+        """Template index, refreshed once per scaffolder (and rechecked with refresh_template)"""
+        with self._index_lock:
+            if self._index is None:
+                if self.template_is_packed():
+                    from template_pack import TemplatePack
+                    index = TemplatePack(self.template_dir)
+                else:
+                    index = TemplateIndex(self.template_dir, persist=self.save_template_index)
+                    index.refresh()
+                self._index = index
+            return self._index
+
+    def close(self):
+        """Unmap a compiled template; it is mapped again if the scaffolder is used later"""
+        with self._index_lock:
+            index = self._index
+        close = getattr(index, "close", None)
+        if close is not None:
+            close()
+
+    def template_is_packed(self):
+        """Whether template_dir is a compiled template file rather than a directory"""
+        return self.template_dir.endswith(PACK_SUFFIX) and os.path.isfile(self.template_dir)
+
+    def refresh_template_index(self, max_age=None):
+        """Pick up template changes made while this scaffolder is alive
+
+        The template is only walked again when the cheap directory check
+        fails or the last walk is older than max_age seconds.
+        """
+        index = self.template_index()
+        if index.is_current(max_age):
+            return []
+        return index.refresh()
+
+    def placeholder_values(self, project_name, git_account, placeholders=None):
+        """Resolved placeholder values for one project"""
+        return default_placeholders(project_name, self.git_accounts[git_account], placeholders,
+                                    self.template_index().placeholders)
+
+    def templated_paths(self, values):
+        """Customizable files that contain at least one of the given placeholders"""
+        index = self.template_index()
+        return [rel for rel in self.customize_paths
+                if index.placeholder_names(rel) & values.keys()]
+
+    def create_project(self, project_name, git_account, placeholders=None, progress=None,
+                       cancel=None):
+        """Create a project and return its path
+
+        progress(stage, step, total) is called as each of STAGES starts; once
+        the cancel event is set, creation stops at the next stage. The project
+        is built in the staging area and only appears at its path when it is
+        published; a cancelled or failed build is deleted in the background.
+        """
+        trace = self.tracer.start(project_name) if self.tracer else NULL_TRACE
+        status, error = "failed", None
+        try:
+            with activate(trace):
+                project_path = self._create_project(project_name, git_account, placeholders,
+                                                    progress, cancel, trace)
+            status = "ok"
+            return project_path
+        except ScaffoldCancelled:
+            status = "cancelled"
+            raise
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            if trace.enabled:
+                self.tracer.finish(trace, status, error)
+
+    def _create_project(self, project_name, git_account, placeholders, progress, cancel, trace):
+        """The stages of create_project, each timed in trace"""
+        with trace.stage("validate"):
+            self.validate(project_name, git_account)
+            if self.refresh_template:
+                self.refresh_template_index(TEMPLATE_RECHECK_SECONDS)
+            project_path = self.project_path(project_name)
+            values = self.placeholder_values(project_name, git_account, placeholders)
+            templated = self.templated_paths(values)
+
+        def stage(name, cancellable=True):
+            if cancellable and cancel is not None and cancel.is_set():
+                raise ScaffoldCancelled(f"Creation of '{project_name}' was cancelled")
+            if progress is not None:
+                progress(name, STAGES.index(name), len(STAGES))
+            return trace.stage(name)
+
+        # Create the build directory, or take over a pre-built skeleton
+        with stage("directory"):
+            build_path = self.staging.reserve()
+            pooled = self.pool is not None and self.pool.claim(build_path)
+            if pooled:
+                trace.count("pooled")
+                # Skeletons leave out every customizable file with placeholders
+                templated = self.pool.render_paths()
+            else:
+                os.mkdir(build_path)
+        try:
+            # Copy template files (templated ones are rendered instead)
+            with stage("copy"):
+                if not pooled:
+                    self.copy_template_files(build_path, skip_paths=templated)
+
+            # Customize files with project info
+            with stage("customize"):
+                self.customize_files(build_path, project_name, git_account, placeholders,
+                                     templated)
+
+            # Initialize Git repository
+            with stage("git"):
+                self.initialize_git(build_path, project_name, git_account, rendered=templated,
+                                    pooled=pooled)
+
+            # Make the project appear at its path, complete, in one rename
+            with stage("publish"):
+                if self.durable:
+                    trace.count("syncs", sync_tree(build_path))
+                try:
+                    self.staging.publish(build_path, project_path)
+                except FileExistsError:
+                    raise ScaffoldError(f"Project '{project_name}' already exists!")
+        except BaseException:
+            self.remove_partial_project(build_path)
+            raise
+
+        # Add project to allowed repositories list (once published, nothing is rolled back)
+        with stage("register", cancellable=False):
+            self.add_project_to_allowed_repos(project_name, git_account)
+            self.record_generation(project_path, project_name, git_account, values)
+
+        if pooled:
+            self.pool.refill_async()
+        if progress is not None:
+            progress("done", len(STAGES), len(STAGES))
+        return project_path
+
+    def remove_partial_project(self, build_path):
+        """Delete the build of a failed or cancelled creation without waiting for it"""
+        if os.path.exists(build_path):
+            self.staging.discard(build_path)
+
+    def add_project_to_allowed_repos(self, project_name, git_account):
+        """Add new project to the allowed repositories list"""
+        try:
+            self.registry.add_repository(git_account, project_name)
+            if self.export_allowed_repos:
+                self.registry.export_allowed_repos()
+        except Exception as e:
+            _warn(f"Warning: Could not update allowed repositories: {e}")
+
+    def template_store(self):
+        """Store of template file versions that later upgrades merge against"""
+        with self._index_lock:
+            if self._template_store is None:
+                from upgrade import TemplateFileStore
+                self._template_store = TemplateFileStore(
+                    os.path.join(self.developer_dir, STATE_DIRNAME, "template-files"))
+            return self._template_store
+
+    def record_generation(self, project_path, project_name, git_account, values):
+        """Remember the template version and values a project was generated from"""
+        index = self.template_index()
+        try:
+            self.template_store().add_index(index)
+            self.registry.record_project(
+                project_path, project_name, git_account, index.source,
+                template_version(index.files), values,
+                {rel: entry["sha256"] for rel, entry in index.files.items()})
+        except Exception as e:
+            _warn(f"Warning: Could not record the project's template version: {e}")
+
+    def copy_template_files(self, project_path, skip_paths=()):
+        """Copy template files to new project"""
+        # Untouched files are reflinked/kernel-copied (or written from the mapped
+        # compiled template); templated ones are rendered separately
+        index = self.template_index()
+        if self.template_is_packed():
+            stats = index.materialize(project_path, skip_paths=skip_paths)
+        else:
+            stats = self.materializer.materialize(self.template_dir, project_path,
+                                                  skip_paths=skip_paths, index=index)
+        trace = current()
+        if trace.enabled:
+            trace.count("files_copied", stats["files"])
+            trace.count("bytes_copied", stats["bytes_written"])
+            trace.count("bytes_shared", stats["bytes_shared"])
+        return stats
+
+    def customize_files(self, project_path, project_name, git_account, placeholders=None,
+                        paths=None):
+        """Render templated files into the project with project-specific information"""
+        from render import PlaceholderRenderer
+
+        values = self.placeholder_values(project_name, git_account, placeholders)
+        renderer = PlaceholderRenderer(values)
+        if paths is None:
+            paths = self.templated_paths(values)
+
+        index = self.template_index()
+        for rel in paths:
+            entry = index.files[rel]
+            dst = os.path.join(project_path, rel)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            # Splice values in at the indexed offsets, straight from the template file
+            if self.template_is_packed():
+                renderer.render_buffer(index.content(rel), dst, entry["placeholders"],
+                                       entry["mode"])
+            else:
+                renderer.render_spliced(os.path.join(self.template_dir, rel), dst,
+                                        entry["placeholders"], entry["size"],
+                                        entry["mtime_ns"])
+            current().count("files_rendered")
+
+    def object_cache(self):
+        """Shared template object cache (git object modules are only imported when used)"""
+        with self._index_lock:
+            if self._object_cache is None and self.object_sharing:
+                from gitobjects import shared_object_cache
+                self._object_cache = shared_object_cache(
+                    os.path.join(self.developer_dir, STATE_DIRNAME, "git-objects"))
+            return self._object_cache
+
+    def initialize_git(self, project_path, project_name, git_account, rendered=None,
+                       pooled=False):
+        """Initialize Git repository with proper error handling
+
+        rendered lists the files customize_files produced; when given, the
+        objects backend builds the commit from the template object cache.
+        pooled means the project is a pool skeleton prepared by prepare_pooled_git.
+        """
+        if self.git_backend == "objects":
+            from gitobjects import UnsupportedTree
+            try:
+                return self._initialize_git_objects(project_path, project_name, git_account,
+                                                    rendered)
+            except UnsupportedTree:
+                pass
+        return self._initialize_git_subprocess(project_path, project_name, git_account,
+                                               pooled)
+
+    def prepare_pooled_git(self, skeleton_path):
+        """Initialize a pool skeleton's repository and stage its files ahead of time
+
+        Only the subprocess backend benefits: the objects backend builds the
+        whole repository from its object cache when the skeleton is claimed.
+        """
+        if self.git_backend != "subprocess":
+            return
+        import subprocess
+
+        for args in (["init"], ["add", "-A"]):
+            subprocess.run(["git", *args], cwd=skeleton_path, capture_output=True, check=True)
+
+    def _initialize_git_objects(self, project_path, project_name, git_account, rendered=None):
+        """Write the repository and initial commit in-process"""
+        from gitobjects import UnsupportedTree, init_repository, init_repository_from_template
+
+        account = self.git_accounts[git_account]
+        index = self.template_index()
+        cache = self.object_cache()
+        from_template = cache is not None and rendered is not None and index.files
+        if not from_template and not any(name != ".git" for name in os.listdir(project_path)):
+            self._write_placeholder_readme(project_path, project_name)
+        try:
+            if from_template:
+                cache.sync(index)
+                writer = init_repository_from_template(
+                    project_path, account['name'], account['email'],
+                    remote_url(account, project_name), COMMIT_MESSAGE,
+                    index, cache, rendered, self.object_sharing)
+            else:
+                writer = init_repository(project_path, account['name'], account['email'],
+                                         remote_url(account, project_name), COMMIT_MESSAGE)
+            current().count("objects_written", writer.objects_written)
+            if writer.objects_shared:
+                # Linked or borrowed from the template object cache instead of written
+                current().count("objects_shared", writer.objects_shared)
+        except UnsupportedTree:
+            raise
+        except Exception as e:
+            # If any Git operations fail, don't crash the app
+            _warn(f"Git initialization warning: {e}")
+
+    def _initialize_git_subprocess(self, project_path, project_name, git_account, pooled=False):
+        """Initialize the repository by running the git CLI"""
+        import subprocess
+
+        account = self.git_accounts[git_account]
+
+        trace = current()
+
+        def git(*args):
+            trace.count("subprocesses")
+            # Run in the project directory instead of chdir so workers can share the process
+            return subprocess.run(["git", *args], cwd=project_path,
+                                  capture_output=True, text=True)
+
+        try:
+            # Initialize Git (no check=True to avoid crashes); skeletons already are
+            pooled = pooled and os.path.isdir(os.path.join(project_path, ".git"))
+            if not pooled:
+                git("init")
+
+            # Set Git configuration
+            git("config", "user.name", account['name'])
+            git("config", "user.email", account['email'])
+
+            # Add remote origin
+            git("remote", "add", "origin", remote_url(account, project_name))
+
+            # Check if there are files to commit
+            if pooled:
+                empty = not any(name != ".git" for name in os.listdir(project_path))
+            else:
+                empty = not git("status", "--porcelain").stdout.strip()
+            if empty:
+                # Create a placeholder file if no files exist
+                self._write_placeholder_readme(project_path, project_name)
+
+            # In a skeleton only the rendered files still need to be hashed
+            git("add", ".")
+            commit_result = git("commit", "-m", COMMIT_MESSAGE)
+            if commit_result.returncode != 0:
+                _warn(f"Git commit warning: {commit_result.stderr}")
+
+        except Exception as e:
+            # If any Git operations fail, don't crash the app
+            _warn(f"Git initialization warning: {e}")
+            # Continue without Git setup - project is still created
+
+    def _write_placeholder_readme(self, project_path, project_name):
+        """Give an empty project something to commit"""
+        with open(os.path.join(project_path, "README.md"), "w") as f:
+            f.write(f"# {project_name}\n\nInitial project setup.")
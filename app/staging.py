@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Project Staging
+Projects are built in a private directory next to the developer directory's
+projects and published with one atomic rename, so a failed or cancelled
+creation never leaves anything at the project's final path
+"""
+
+import errno
+import os
+import threading
+
+
+def process_alive(pid):
+    """Whether a process with this id exists"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _fsync_path(path, flags=os.O_RDONLY):
+    fd = os.open(path, flags)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def sync_tree(root):
+    """fsync every file and directory under root; return the number of sync calls made
+
+    Called once per project right before it is published, instead of
+    syncing each file as it is written. Only the build's own files are
+    flushed, never the rest of the filesystem.
+    """
+    calls = 0
+    dirs = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirs.append(dirpath)
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if not os.path.islink(path):
+                _fsync_path(path)
+                calls += 1
+    # Children before parents, so every directory entry points at synced data
+    for path in reversed(dirs):
+        _fsync_path(path, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+    return calls + len(dirs)
+
+
+_syncfs = None
+
+
+def _load_syncfs():
+    """libc's syncfs(2) (Linux), or False where it is not available"""
+    global _syncfs
+    if _syncfs is None:
+        try:
+            import ctypes
+            _syncfs = ctypes.CDLL(None, use_errno=True).syncfs
+        except (ImportError, OSError, AttributeError):
+            _syncfs = False
+    return _syncfs
+
+
+def sync_filesystem(path):
+    """Flush the filesystem holding path once; False if the platform cannot
+
+    For batch runs: one flush after every project is published replaces a
+    sync_tree per project. Uses syncfs(2) on Linux, sync(2) elsewhere.
+    """
+    syncfs = _load_syncfs()
+    if syncfs:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            if syncfs(fd) == 0:
+                return True
+        finally:
+            os.close(fd)
+    if hasattr(os, "sync"):
+        os.sync()
+        return True
+    return False
+
+
+class StagingArea:
+    """Build directories on the developer directory's filesystem
+
+    Each build is named after the creating process, so builds abandoned by
+    a process that died are recognised and removed by prune().
+    """
+
+    def __init__(self, staging_dir):
+        self.staging_dir = staging_dir
+        self._pruned = False
+
+    def reserve(self):
+        """A fresh build path (not created yet)"""
+        if not self._pruned:
+            self._pruned = True
+            self.prune()
+        os.makedirs(self.staging_dir, exist_ok=True)
+        return os.path.join(self.staging_dir, f"{os.getpid()}-{os.urandom(6).hex()}")
+
+    def publish(self, build_path, project_path):
+        """Move a finished build to its final path in one step
+
+        Raises FileExistsError if something was published there meanwhile
+        (e.g. by a concurrent batch run); the existing project is left alone.
+        """
+        try:
+            os.rename(build_path, project_path)
+        except OSError as e:
+            if e.errno in (errno.EEXIST, errno.ENOTEMPTY):
+                raise FileExistsError(errno.EEXIST, "Project already exists", project_path)
+            if e.errno != errno.EXDEV:
+                raise
+            # The state folder is on another filesystem (e.g. a symlink); not atomic
+            import shutil
+            if os.path.exists(project_path):
+                raise FileExistsError(errno.EEXIST, "Project already exists", project_path)
+            shutil.move(build_path, project_path)
+        # Make the new directory entry itself durable
+        _fsync_path(os.path.dirname(os.path.abspath(project_path)),
+                    os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+
+    def discard(self, build_path):
+        """Delete a build on a background thread and return the thread
+
+        The thread is not a daemon thread, so a short-lived process still
+        finishes the deletion before it exits.
+        """
+        import shutil
+
+        thread = threading.Thread(target=shutil.rmtree, args=(build_path, True),
+                                  name="staging-discard")
+        thread.start()
+        return thread
+
+    def prune(self):
+        """Remove builds left behind by processes that no longer exist"""
+        import shutil
+
+        try:
+            names = os.listdir(self.staging_dir)
+        except FileNotFoundError:
+            return
+        for name in names:
+            pid = name.partition("-")[0]
+            if pid.isdigit() and int(pid) != os.getpid() and not process_alive(int(pid)):
+                shutil.rmtree(os.path.join(self.staging_dir, name), ignore_errors=True)
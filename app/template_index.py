@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Template Index
+Persistent manifest of a template's files, modes, content hashes and
+placeholder offsets, refreshed incrementally from (size, mtime)
+"""
+
+import json
+import os
+import stat
+import threading
+import time
+
+INDEX_FILENAME = ".template-index.json"
+INDEX_VERSION = 1
+
+# Compiled templates (see template_pack.py) use this suffix instead of being a directory
+PACK_SUFFIX = ".ptpl"
+
+# Layer description (inheritance, placeholder defaults) read by template_registry.py
+LAYER_MANIFEST = ".project-template.json"
+
+# Tool files that live in a template directory but are never part of a project
+TOOL_FILES = frozenset((INDEX_FILENAME, LAYER_MANIFEST))
+
+
+def template_version(files):
+    """Hash identifying a template's exact content: every path, mode and file hash"""
+    import hashlib
+
+    digest = hashlib.sha256()
+    for rel in sorted(files):
+        entry = files[rel]
+        digest.update(f"{rel}\0{entry['mode']:o}\0{entry['sha256']}\n".encode())
+    return digest.hexdigest()
+
+
+class TemplateIndex:
+    """Index of every file in a template directory
+
+    files maps relative paths to {"mode", "size", "mtime_ns", "sha256",
+    "placeholders": {name: [byte offsets]}}; dirs maps relative directory
+    paths to their mode, parents before children.
+    """
+
+    def __init__(self, template_dir, index_path=None, persist=True):
+        self.template_dir = template_dir
+        self.index_path = index_path or os.path.join(template_dir, INDEX_FILENAME)
+        # False keeps the index in memory only (dry runs never write)
+        self.persist = persist
+        self.source = os.path.basename(os.path.normpath(template_dir))
+        # Placeholder defaults; only compiled layer compositions carry any
+        self.placeholders = {}
+        self.files = {}
+        self.dirs = {}
+        # Directory mtimes seen by the last refresh, for is_current()
+        self._dir_mtimes = {}
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def load(self):
+        """Read the saved index, ignoring it if missing or from another version"""
+        try:
+            with open(self.index_path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("version") != INDEX_VERSION:
+            return False
+        self.files = data.get("files", {})
+        self.dirs = data.get("dirs", {})
+        return True
+
+    def save(self):
+        """Atomically write the index next to the template"""
+        tmp_path = f"{self.index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"version": INDEX_VERSION, "dirs": self.dirs, "files": self.files}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def refresh(self):
+        """Bring the index up to date and return the paths whose content changed
+
+        Only files whose size or mtime differ from the index are read; a file
+        that was touched but hashes the same keeps its placeholder offsets.
+        """
+        with self._lock:
+            if not self._loaded:
+                self.load()
+                self._loaded = True
+
+            files, dirs, changed = {}, {}, []
+            mtimes = {"": os.stat(self.template_dir).st_mtime_ns}
+            self._walk("", files, dirs, changed, mtimes)
+            removed = self.files.keys() - files.keys()
+            dirty = bool(changed or removed or dirs != self.dirs
+                         or any(files[rel] is not self.files.get(rel) for rel in files))
+
+            self.files, self.dirs = files, dirs
+            if dirty and self.persist:
+                try:
+                    self.save()
+                except OSError as e:
+                    # A read-only template still works, it just re-hashes next time
+                    print(f"Warning: Could not save template index: {e}")
+                else:
+                    # Saving the index is not a template change
+                    if os.path.dirname(self.index_path) == os.path.normpath(self.template_dir):
+                        mtimes[""] = os.stat(self.template_dir).st_mtime_ns
+            self._dir_mtimes, self._refreshed_at = mtimes, time.monotonic()
+            return changed + sorted(removed)
+
+    def is_current(self, max_age=None):
+        """Cheap check that no file was added, removed or replaced since the last refresh
+
+        Only the template's directories are stat'ed: their mtime changes when
+        an entry is created, deleted or renamed, which is how git and most
+        editors save. In-place edits are only seen by refresh(); max_age
+        (seconds) makes an older refresh count as out of date.
+        """
+        with self._lock:
+            mtimes, refreshed_at = self._dir_mtimes, self._refreshed_at
+        if refreshed_at is None or (max_age is not None
+                                    and time.monotonic() - refreshed_at >= max_age):
+            return False
+        for rel, mtime in mtimes.items():
+            try:
+                if os.stat(os.path.join(self.template_dir, rel)).st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def _walk(self, rel_dir, files, dirs, changed, mtimes):
+        """Stat-only walk of one directory, re-hashing files that look modified"""
+        full_dir = os.path.join(self.template_dir, rel_dir) if rel_dir else self.template_dir
+        with os.scandir(full_dir) as entries:
+            for entry in sorted(entries, key=lambda e: e.name):
+                rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                st = entry.stat()
+                if stat.S_ISDIR(st.st_mode):
+                    dirs[rel] = stat.S_IMODE(st.st_mode)
+                    mtimes[rel] = st.st_mtime_ns
+                    self._walk(rel, files, dirs, changed, mtimes)
+                elif stat.S_ISREG(st.st_mode) and rel not in TOOL_FILES:
+                    files[rel] = self._entry(rel, entry.path, st, changed)
+
+    def _entry(self, rel, path, st, changed):
+        """Reuse the indexed entry when size and mtime match, otherwise rescan"""
+        mode = stat.S_IMODE(st.st_mode)
+        old = self.files.get(rel)
+        if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
+            if old["mode"] != mode:
+                return dict(old, mode=mode)
+            return old
+
+        from render import scan_file
+
+        digest, locations = scan_file(path)
+        if old and old["sha256"] == digest:
+            return dict(old, mode=mode, mtime_ns=st.st_mtime_ns)
+        changed.append(rel)
+        return {"mode": mode, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                "sha256": digest, "placeholders": locations}
+
+    def read(self, rel):
+        """A file's content as bytes"""
+        with open(os.path.join(self.template_dir, rel), 'rb') as f:
+            return f.read()
+
+    def placeholder_names(self, rel):
+        """Names of the placeholders used in a file"""
+        entry = self.files.get(rel)
+        return frozenset(entry["placeholders"]) if entry else frozenset()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Compiled Templates
+A template packed into one file (file table, modes, placeholder offsets and
+content, optionally compressed) that is memory-mapped and materialized
+without touching the original template directory
+
+Usage:
+    python3 template_pack.py build TEMPLATE_DIR [-o OUT.ptpl] [--compress]
+    python3 template_pack.py info PACK.ptpl
+"""
+
+import json
+import os
+import struct
+import sys
+import threading
+
+from template_index import PACK_SUFFIX, TemplateIndex
+
+PACK_MAGIC = b"PTPL"
+PACK_VERSION = 1
+
+# magic, version, length of the JSON file table
+HEADER = struct.Struct("<4sIQ")
+
+# Content starts on a page boundary so the mapping of file data is aligned
+DATA_ALIGN = 4096
+
+# Only keep a compressed copy when it saves at least this fraction
+MIN_COMPRESSION_GAIN = 0.1
+
+
+class PackError(Exception):
+    """Raised for files that are not compiled templates of a supported version"""
+
+
+def build_pack(template_dir, pack_path, compress=False):
+    """Compile a template directory into a pack file and return its file table"""
+    index = TemplateIndex(template_dir)
+    index.refresh()
+    return write_pack(pack_path, index.source, index.dirs, index.files, index.read,
+                      compress=compress)
+
+
+def write_pack(pack_path, source, dirs, files, read, placeholders=None, compress=False):
+    """Write a pack of index-style entries, reading contents with read(rel)
+
+    Identical contents are stored once. The pack is written next to its
+    destination and renamed into place, so a half-written pack is never seen.
+    """
+    table_files, blobs, chunks = {}, {}, []
+    offset = 0
+    for rel, entry in files.items():
+        packed = dict(entry)
+        if entry["sha256"] not in blobs:
+            data = read(rel)
+            stored, compression = data, None
+            if compress and data:
+                import zlib
+                candidate = zlib.compress(data, 9)
+                if len(candidate) <= len(data) * (1 - MIN_COMPRESSION_GAIN):
+                    stored, compression = candidate, "zlib"
+            blobs[entry["sha256"]] = (offset, len(stored), compression)
+            chunks.append(stored)
+            offset += len(stored)
+        packed["offset"], packed["stored"], compression = blobs[entry["sha256"]]
+        if compression:
+            packed["compression"] = compression
+        table_files[rel] = packed
+
+    table = json.dumps({"version": PACK_VERSION, "source": source, "dirs": dirs,
+                        "files": table_files, "placeholders": placeholders or {}}).encode()
+    header = HEADER.pack(PACK_MAGIC, PACK_VERSION, len(table)) + table
+    padding = -len(header) % DATA_ALIGN
+
+    tmp_path = f"{pack_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(header + b"\0" * padding)
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp_path, pack_path)
+    return table_files
+
+
+class TemplatePack:
+    """Read-only view of a compiled template, shaped like a TemplateIndex
+
+    files and dirs have the same entries as TemplateIndex, so code that
+    works from an index (placeholder lookup, git object cache) works from
+    a pack too; content comes from the memory-mapped pack instead of the
+    template directory.
+    """
+
+    def __init__(self, pack_path):
+        self.pack_path = pack_path
+        with open(pack_path, 'rb') as f:
+            raw = f.read(HEADER.size)
+            if len(raw) < HEADER.size:
+                raise PackError(f"Not a compiled template: {pack_path}")
+            magic, version, table_len = HEADER.unpack(raw)
+            if magic != PACK_MAGIC:
+                raise PackError(f"Not a compiled template: {pack_path}")
+            if version != PACK_VERSION:
+                raise PackError(f"Unsupported compiled template version {version}: {pack_path}")
+            table = json.loads(f.read(table_len))
+        self.source = table.get("source", "")
+        self.placeholders = table.get("placeholders", {})
+        self.dirs = table["dirs"]
+        self.files = table["files"]
+        header_len = HEADER.size + table_len
+        self.data_offset = header_len + (-header_len % DATA_ALIGN)
+        self._map = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Packs are immutable; nothing ever changes"""
+        return []
+
+    def is_current(self, max_age=None):
+        """Packs are immutable; always current"""
+        return True
+
+    def placeholder_names(self, rel):
+        """Names of the placeholders used in a file"""
+        entry = self.files.get(rel)
+        return frozenset(entry["placeholders"]) if entry else frozenset()
+
+    def _mapping(self):
+        """The whole pack, mapped once and shared by every thread"""
+        with self._lock:
+            if self._map is None:
+                import mmap
+                with open(self.pack_path, 'rb') as f:
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._map
+
+    def content(self, rel):
+        """A file's content: a zero-copy view into the pack unless it is compressed"""
+        entry = self.files[rel]
+        start = self.data_offset + entry["offset"]
+        view = memoryview(self._mapping())[start:start + entry["stored"]]
+        if entry.get("compression") == "zlib":
+            import zlib
+            return zlib.decompress(view)
+        return view
+
+    def read(self, rel):
+        """A file's content as bytes"""
+        return bytes(self.content(rel))
+
+    def materialize(self, project_path, skip_paths=()):
+        """Write every file except skip_paths under project_path and return statistics"""
+        skip = {os.path.normpath(p) for p in skip_paths}
+        stats = {"files": 0, "bytes_written": 0, "bytes_shared": 0, "strategies": {}}
+
+        for rel in self.dirs:
+            os.makedirs(os.path.join(project_path, rel), exist_ok=True)
+
+        for rel, entry in self.files.items():
+            if os.path.normpath(rel) in skip:
+                continue
+            dst = os.path.join(project_path, rel)
+            fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL, entry["mode"])
+            try:
+                data = self.content(rel)
+                written = 0
+                while written < len(data):
+                    written += os.write(fd, data[written:])
+                os.fchmod(fd, entry["mode"])
+            finally:
+                os.close(fd)
+            os.utime(dst, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+            stats["files"] += 1
+            stats["bytes_written"] += entry["size"]
+        stats["strategies"]["pack"] = stats["files"]
+
+        # Apply directory modes last so read-only directories can still be filled
+        for rel in reversed(list(self.dirs)):
+            os.chmod(os.path.join(project_path, rel), self.dirs[rel])
+        return stats
+
+    def close(self):
+        """Unmap the pack"""
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+
+
+def main(argv=None):
+    """Build or inspect compiled templates"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile templates into one packed file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Compile a template directory")
+    build.add_argument("template_dir")
+    build.add_argument("-o", "--output", help=f"Pack file (default: TEMPLATE_DIR{PACK_SUFFIX})")
+    build.add_argument("--compress", action="store_true",
+                       help="zlib-compress files where it saves space")
+    info = commands.add_parser("info", help="List the contents of a pack")
+    info.add_argument("pack")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        output = args.output or os.path.normpath(args.template_dir) + PACK_SUFFIX
+        files = build_pack(args.template_dir, output, args.compress)
+        size = sum(entry["size"] for entry in files.values())
+        print(f"Packed {len(files)} files ({size} bytes) into {output} "
+              f"({os.path.getsize(output)} bytes)")
+        return 0
+
+    try:
+        pack = TemplatePack(args.pack)
+    except PackError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"{args.pack}: template '{pack.source}', {len(pack.files)} files, {len(pack.dirs)} dirs")
+    for rel, entry in pack.files.items():
+        names = ", ".join(sorted(entry["placeholders"]))
+        stored = f"{entry['stored']} {entry['compression']}" if entry.get("compression") else ""
+        print(f"  {entry['mode']:o} {entry['size']:>10} {rel}"
+              + (f" ({stored})" if stored else "") + (f" [{names}]" if names else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Template Registry
+Composes layered templates (base + stack + team overlays) and caches each
+resolved combination as a compiled template keyed by its layers' hashes
+
+A layer is a template directory. Its optional .project-template.json holds:
+    {"extends": ["project-template-minimal"],        parent layers, base first
+     "placeholders": {"RUNTIME": "Python", ...},     defaults for the project
+     "remove": ["package.json"]}                     paths inherited files drop
+Combinations are written as "project-template-minimal+stack-python+data-team";
+later layers override files and placeholder defaults of earlier ones.
+"""
+
+import json
+import os
+import threading
+
+from template_index import LAYER_MANIFEST, PACK_SUFFIX, TemplateIndex, template_version
+
+LAYER_SEPARATOR = "+"
+
+
+class TemplateError(Exception):
+    """Raised for unknown layers, broken manifests and inheritance cycles"""
+
+
+class TemplateRegistry:
+    """Named template layers under one directory, compiled per combination"""
+
+    def __init__(self, templates_dir, cache_dir, persist=True):
+        self.templates_dir = templates_dir
+        self.cache_dir = cache_dir
+        # False leaves the layers' saved indexes alone (compiled packs still go to cache_dir)
+        self.persist = persist
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def layer_dir(self, name):
+        """Directory of a layer, which must exist"""
+        if not name or os.sep in name or name.startswith("."):
+            raise TemplateError(f"Invalid template name: {name!r}")
+        path = os.path.join(self.templates_dir, name)
+        if not os.path.isdir(path):
+            raise TemplateError(f"Template not found: {path}")
+        return path
+
+    def manifest(self, name):
+        """A layer's .project-template.json (empty when it has none)"""
+        path = os.path.join(self.layer_dir(name), LAYER_MANIFEST)
+        try:
+            with open(path, 'r') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return {"extends": []}
+        except ValueError as e:
+            raise TemplateError(f"Invalid {path}: {e}")
+        extends = manifest.get("extends", [])
+        manifest["extends"] = [extends] if isinstance(extends, str) else list(extends)
+        return manifest
+
+    def resolve(self, spec):
+        """Layer names of a combination with everything they extend, base first"""
+        layers, manifests = [], {}
+
+        def visit(name, chain):
+            if name in chain:
+                raise TemplateError(f"Template inheritance cycle: {' -> '.join(chain + [name])}")
+            if name in manifests:
+                return
+            manifest = self.manifest(name)
+            for parent in manifest["extends"]:
+                visit(parent, chain + [name])
+            manifests[name] = manifest
+            layers.append(name)
+
+        for name in spec.split(LAYER_SEPARATOR):
+            visit(name.strip(), [])
+        return layers, manifests
+
+    def compile(self, spec):
+        """Path of the compiled template for a combination
+
+        Layers are only stat-walked (their indexes are incremental); the
+        composition is rebuilt only when a layer's content or manifest changed.
+        """
+        from template_pack import write_pack
+
+        with self._lock:
+            layers, manifests = self.resolve(spec)
+            indexes = []
+            for name in layers:
+                index = TemplateIndex(self.layer_dir(name), persist=self.persist)
+                index.refresh()
+                indexes.append(index)
+
+            import hashlib
+            key = hashlib.sha256(json.dumps(
+                [[name, template_version(index.files), manifests[name]]
+                 for name, index in zip(layers, indexes)], sort_keys=True).encode()).hexdigest()
+            if key in self._compiled:
+                return self._compiled[key]
+
+            slug = LAYER_SEPARATOR.join(layers)
+            pack_path = os.path.join(self.cache_dir, f"{slug}-{key[:16]}{PACK_SUFFIX}")
+            if not os.path.exists(pack_path):
+                os.makedirs(self.cache_dir, exist_ok=True)
+                dirs, files, sources, placeholders = self._compose(layers, manifests, indexes)
+                write_pack(pack_path, slug, dirs, files,
+                           lambda rel: sources[rel].read(rel), placeholders)
+                self._prune(slug, pack_path)
+            self._compiled[key] = pack_path
+            return pack_path
+
+    def _compose(self, layers, manifests, indexes):
+        """Overlay the layers: later files, modes and placeholder defaults win"""
+        dirs, files, sources, placeholders = {}, {}, {}, {}
+        for name, index in zip(layers, indexes):
+            manifest = manifests[name]
+            for removed in manifest.get("remove", []):
+                removed = removed.strip("/")
+                for rel in [rel for rel in files
+                            if rel == removed or rel.startswith(removed + "/")]:
+                    del files[rel], sources[rel]
+                for rel in [rel for rel in dirs
+                            if rel == removed or rel.startswith(removed + "/")]:
+                    del dirs[rel]
+            dirs.update(index.dirs)
+            for rel, entry in index.files.items():
+                files[rel] = entry
+                sources[rel] = index
+            placeholders.update(manifest.get("placeholders", {}))
+        # Parents before children, as in a TemplateIndex
+        return dict(sorted(dirs.items())), files, sources, placeholders
+
+    def _prune(self, slug, keep):
+        """Delete compilations of the same combination that are now outdated"""
+        prefix = f"{slug}-"
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if (name.startswith(prefix) and name.endswith(PACK_SUFFIX) and path != keep
+                    and len(name) == len(prefix) + 16 + len(PACK_SUFFIX)):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
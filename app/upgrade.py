@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Template Upgrade
+Brings already scaffolded projects up to date with their template: only
+files that changed in the template since a project was generated are
+applied, three-way merged with the project's own edits
+"""
+
+import os
+import sys
+import threading
+
+from template_index import template_version
+
+UPGRADE_MESSAGE = "Upgrade project template"
+
+# Written next to a file whose new template version could not be merged (e.g. binary)
+NEW_VERSION_SUFFIX = ".template-new"
+
+
+class TemplateFileStore:
+    """Content-addressed copies of the template files projects were generated from
+
+    They are the merge base of an upgrade: the template may have changed
+    (or be a different checkout) by the time a project is upgraded.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self._known = set()
+        self._lock = threading.Lock()
+
+    def path(self, sha):
+        return os.path.join(self.store_dir, sha[:2], sha[2:])
+
+    def add_index(self, index):
+        """Store every file of a template index that is not stored yet"""
+        with self._lock:
+            for rel, entry in index.files.items():
+                sha = entry["sha256"]
+                if sha in self._known:
+                    continue
+                path = self.path(sha)
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                    with open(tmp_path, 'wb') as f:
+                        f.write(index.read(rel))
+                    os.replace(tmp_path, path)
+                self._known.add(sha)
+
+    def get(self, sha):
+        """Stored content, or None if it was never stored"""
+        try:
+            with open(self.path(sha), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+def merge_three_way(mine, base, theirs):
+    """Merge two edits of base with git merge-file; return (content, conflict count)
+
+    Raises ValueError when git cannot merge the contents (binary files).
+    """
+    import subprocess
+    import tempfile
+
+    with tempfile.TemporaryDirectory(prefix="template-merge-") as tmp_dir:
+        paths = []
+        for name, data in (("project", mine), ("base", base), ("template", theirs)):
+            path = os.path.join(tmp_dir, name)
+            with open(path, 'wb') as f:
+                f.write(data)
+            paths.append(path)
+        result = subprocess.run(["git", "merge-file", "-p", "-L", "project",
+                                 "-L", "previous template", "-L", "template", *paths],
+                                capture_output=True)
+    # Clean merges exit 0, conflicts with their count, errors with a negative status
+    if result.returncode < 0 or result.returncode > 127:
+        raise ValueError(result.stderr.decode(errors="replace").strip() or "merge failed")
+    return result.stdout, result.returncode
+
+
+def _read(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _write(path, data, mode=None):
+    """Atomically replace a project file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    if mode is None and os.path.exists(path):
+        mode = os.stat(path).st_mode & 0o7777
+    if mode is not None:
+        os.chmod(tmp_path, mode)
+    os.replace(tmp_path, path)
+
+
+class TemplateUpgrader:
+    """Apply template changes to the projects a scaffolder has generated"""
+
+    def __init__(self, scaffolder, dry_run=False, commit=False):
+        self.scaffolder = scaffolder
+        self.dry_run = dry_run
+        self.commit = commit
+
+    def upgrade_all(self, names=None, workers=None):
+        """Upgrade every recorded project of the template (or just names), in parallel"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        index = self.scaffolder.template_index()
+        if not self.dry_run:
+            # The current version becomes the merge base of the next upgrade
+            self.scaffolder.template_store().add_index(index)
+        version = template_version(index.files)
+
+        records = self.scaffolder.registry.projects(index.source)
+        if names:
+            records = [r for r in records if r["name"] in names]
+        workers = workers or os.cpu_count() or 1
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(lambda r: self._upgrade_safely(r, index, version), records))
+
+    def _upgrade_safely(self, record, index, version):
+        try:
+            return self.upgrade_project(record, index, version)
+        except Exception as e:
+            return {"project": record["name"], "status": "failed", "error": str(e)}
+
+    def upgrade_project(self, record, index, version):
+        """Apply the template changes since the project's recorded version"""
+        result = {"project": record["name"], "path": record["path"], "status": "current",
+                  "updated": [], "merged": [], "added": [], "removed": [], "conflicts": []}
+        if record["template_version"] == version:
+            return result
+        if not os.path.isdir(record["path"]):
+            result["status"] = "missing"
+            return result
+
+        from render import PlaceholderRenderer
+
+        renderer = PlaceholderRenderer(record["placeholders"])
+        store = self.scaffolder.template_store()
+        rendered = set(self.scaffolder.customize_paths)
+        old_files = record["files"]
+
+        def render(rel, data):
+            return renderer.render_bytes(data) if rel in rendered else data
+
+        for rel, entry in index.files.items():
+            old_sha = old_files.get(rel)
+            if old_sha == entry["sha256"]:
+                # Unchanged in the template: never even looked at
+                continue
+            path = os.path.join(record["path"], rel)
+            mine = _read(path)
+            theirs = render(rel, index.read(rel))
+            base = None
+            if old_sha is not None:
+                base = store.get(old_sha)
+                base = render(rel, base) if base is not None else None
+
+            if mine is None:
+                if old_sha is None:
+                    # New in the template
+                    self._apply(result, "added", rel, path, theirs, entry["mode"])
+                # Otherwise the project deleted it on purpose
+            elif mine == theirs:
+                continue
+            elif base is not None and mine == base:
+                # Not edited in the project: take the template's version
+                self._apply(result, "updated", rel, path, theirs, entry["mode"])
+            else:
+                self._merge(result, rel, path, mine, base or b"", theirs)
+
+        for rel in old_files.keys() - index.files.keys():
+            path = os.path.join(record["path"], rel)
+            base = store.get(old_files[rel])
+            mine = _read(path)
+            if mine is not None and base is not None and mine == render(rel, base):
+                result["removed"].append(rel)
+                if not self.dry_run:
+                    os.unlink(path)
+
+        changed = any(result[key] for key in ("updated", "merged", "added", "removed"))
+        result["status"] = ("conflicts" if result["conflicts"]
+                            else "upgraded" if changed else "current")
+        if self.dry_run:
+            return result
+
+        self.scaffolder.registry.record_project(
+            record["path"], record["name"], record["account"], index.source, version,
+            record["placeholders"], {rel: entry["sha256"] for rel, entry in index.files.items()})
+        if self.commit and changed and not result["conflicts"]:
+            self._commit(record["path"], [rel for key in ("updated", "merged", "added", "removed")
+                                          for rel in result[key]])
+        return result
+
+    def _apply(self, result, kind, rel, path, data, mode=None):
+        result[kind].append(rel)
+        if not self.dry_run:
+            _write(path, data, mode)
+
+    def _merge(self, result, rel, path, mine, base, theirs):
+        """Three-way merge a file edited both in the project and in the template"""
+        try:
+            merged, conflicts = merge_three_way(mine, base, theirs)
+        except ValueError:
+            # Cannot be merged: keep the project's file, put the new version next to it
+            result["conflicts"].append(rel)
+            if not self.dry_run:
+                _write(path + NEW_VERSION_SUFFIX, theirs)
+            return
+        if conflicts:
+            # Conflict markers are left in the file, as git does
+            result["conflicts"].append(rel)
+            if not self.dry_run:
+                _write(path, merged)
+        else:
+            self._apply(result, "merged", rel, path, merged)
+
+    def _commit(self, project_path, paths):
+        """Commit the upgraded files (and nothing else) in the project repository"""
+        import subprocess
+
+        if not os.path.isdir(os.path.join(project_path, ".git")):
+            return
+        subprocess.run(["git", "add", "-A", "--", *paths], cwd=project_path,
+                       capture_output=True, check=True)
+        subprocess.run(["git", "commit", "-m", UPGRADE_MESSAGE, "--", *paths], cwd=project_path,
+                       capture_output=True, check=True)
+
+
+def print_report(results, stream=sys.stdout):
+    """One line per project that changed or needs attention"""
+    counts = {}
+    for r in results:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+        if r["status"] == "current":
+            continue
+        if r["status"] in ("failed", "missing"):
+            print(f"❌ {r['project']}: {r.get('error', 'project directory is gone')}", file=stream)
+            continue
+        parts = [f"{len(r[key])} {key}" for key in ("updated", "merged", "added", "removed")
+                 if r[key]]
+        icon = "⚠️ " if r["conflicts"] else "⬆️ "
+        print(f"{icon}{r['project']}: {', '.join(parts) or 'no file changes'}", file=stream)
+        for rel in r["conflicts"]:
+            print(f"    conflict: {rel}", file=stream)
+    summary = ", ".join(f"{n} {status}" for status, n in sorted(counts.items()))
+    print(f"\n{len(results)} projects: {summary or 'none recorded for this template'}", file=stream)
+
+
+def main(argv=None):
+    """Upgrade entry point"""
+    import argparse
+
+    from accounts import DEFAULT_CONFIG_FILE
+    from scaffold import (
+        DEFAULT_DEVELOPER_DIR, DEFAULT_TEMPLATE_DIR,
+        ProjectScaffolder, open_registry, open_template_registry
+    )
+    from template_registry import TemplateError
+
+    parser = argparse.ArgumentParser(description="Apply template changes to existing projects")
+    parser.add_argument("projects", nargs="*", help="Project names (default: all)")
+    parser.add_argument("--accounts", default=DEFAULT_CONFIG_FILE)
+    parser.add_argument("--developer-dir", default=DEFAULT_DEVELOPER_DIR)
+    parser.add_argument("--template-dir", default=DEFAULT_TEMPLATE_DIR)
+    parser.add_argument("--template", help="Layered template whose projects to upgrade")
+    parser.add_argument("--templates-dir", help="Where template layers live")
+    parser.add_argument("--dry-run", action="store_true", help="Report without changing files")
+    parser.add_argument("--commit", action="store_true",
+                        help="Commit the upgraded files in projects without conflicts")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker threads (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    template_dir = args.template_dir
+    if args.template:
+        try:
+            template_dir = open_template_registry(
+                args.developer_dir, args.templates_dir).compile(args.template)
+        except TemplateError as e:
+            parser.error(str(e))
+    registry = open_registry(args.developer_dir, args.accounts)
+    scaffolder = ProjectScaffolder(registry.accounts(), args.developer_dir, template_dir,
+                                   registry=registry)
+    upgrader = TemplateUpgrader(scaffolder, dry_run=args.dry_run, commit=args.commit)
+    results = upgrader.upgrade_all(args.projects or None, args.workers)
+    print_report(results)
+    return 1 if any(r["status"] in ("failed", "conflicts") for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Materialization Benchmark
+Compares copy strategies by time and bytes written per project
+
+Usage:
+    python3 benchmarks/bench_materialize.py [--template DIR] [--projects N]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from materialize import STRATEGIES, TemplateMaterializer  # noqa: E402
+from scaffold import CUSTOMIZE_FILES  # noqa: E402
+
+REPO_TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                             "templates", "project-template-minimal")
+
+
+def make_synthetic_template(path, assets=200, asset_size=256 * 1024):
+    """Copy the minimal template and add vendored binary assets"""
+    shutil.copytree(REPO_TEMPLATE, path)
+    vendor = os.path.join(path, "vendor")
+    os.makedirs(vendor)
+    chunk = os.urandom(asset_size)
+    for i in range(assets):
+        with open(os.path.join(vendor, f"asset-{i:04d}.bin"), 'wb') as f:
+            f.write(chunk)
+
+
+def legacy_copy(template_dir, project_path):
+    """The original copytree/copy2 behaviour, for reference"""
+    for item in os.listdir(template_dir):
+        src = os.path.join(template_dir, item)
+        dst = os.path.join(project_path, item)
+        if os.path.isdir(src):
+            shutil.copytree(src, dst)
+        else:
+            shutil.copy2(src, dst)
+
+
+def bench(name, template_dir, work_dir, projects, materialize):
+    """Materialize N projects and return (seconds per project, stats of the last run)"""
+    stats = {}
+    start = time.perf_counter()
+    for i in range(projects):
+        project_path = os.path.join(work_dir, f"{name}-{i}")
+        os.makedirs(project_path)
+        stats = materialize(template_dir, project_path) or stats
+    elapsed = (time.perf_counter() - start) / projects
+    return elapsed, stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--template", help="Template directory (default: synthetic)")
+    parser.add_argument("--projects", type=int, default=10)
+    parser.add_argument("--work-dir", help="Where to create projects (same filesystem "
+                                           "as the template for reflinks to apply)")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="bench-materialize-", dir=args.work_dir)
+    try:
+        template_dir = args.template
+        if not template_dir:
+            template_dir = os.path.join(work_dir, "template")
+            make_synthetic_template(template_dir)
+
+        print(f"{'strategy':<18}{'ms/project':>12}{'MB written':>12}{'MB shared':>12}  used")
+        elapsed, _ = bench("legacy", template_dir, work_dir, args.projects, legacy_copy)
+        total = sum(os.path.getsize(os.path.join(r, f))
+                    for r, _, files in os.walk(template_dir) for f in files)
+        print(f"{'legacy copytree':<18}{elapsed * 1000:>12.2f}{total / 1e6:>12.2f}{0:>12.2f}")
+
+        for strategy in STRATEGIES:
+            chain = (strategy,) if strategy == "copy" else (strategy, "copy")
+            materializer = TemplateMaterializer(chain)
+            elapsed, stats = bench(strategy, template_dir, work_dir, args.projects,
+                                   lambda src, dst: materializer.materialize(
+                                       src, dst, copy_paths=CUSTOMIZE_FILES))
+            used = ", ".join(f"{k}={v}" for k, v in sorted(stats["strategies"].items()))
+            print(f"{strategy:<18}{elapsed * 1000:>12.2f}"
+                  f"{stats['bytes_written'] / 1e6:>12.2f}{stats['bytes_shared'] / 1e6:>12.2f}  {used}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Scaffolding Benchmark Suite
+Scaffolds single projects and batches from synthetic templates of growing
+size into a temp directory, pushes them to local bare remotes, and reports
+throughput, per-stage latency and peak RSS
+
+Usage:
+    python3 benchmarks/bench_scaffold.py [--sizes minimal,medium,large]
+        [--projects N] [--batch N] [--workers N] [--git-backend objects] [--packed]
+        [--save] [--compare benchmarks/results/<file>.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "app"))
+
+from batch import run_batch  # noqa: E402
+from instrument import PERCENTILES, Tracer, percentile, summarize  # noqa: E402
+from materialize import TemplateMaterializer, parse_chain  # noqa: E402
+from scaffold import GIT_BACKENDS, ProjectScaffolder, open_registry  # noqa: E402
+from template_pack import build_pack  # noqa: E402
+
+REPO_TEMPLATE = os.path.join(BENCH_DIR, "..", "templates", "project-template-minimal")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# Extra source files and binary assets added on top of the minimal template
+SIZES = {
+    "minimal": {"files": 0, "asset_mb": 0},
+    "medium": {"files": 2000, "asset_mb": 50},
+    "large": {"files": 20000, "asset_mb": 300},
+}
+FILES_PER_DIR = 100
+ASSET_CHUNK_MB = 16
+
+# Remote URLs point at this host; git rewrites it to the local bare remotes
+REMOTE_HOST = "bench-remote"
+
+
+def make_template(path, files, asset_mb):
+    """Copy the minimal template and add generated sources and assets"""
+    shutil.copytree(REPO_TEMPLATE, path)
+    for i in range(files):
+        directory = os.path.join(path, "src", f"module-{i // FILES_PER_DIR:04d}")
+        if i % FILES_PER_DIR == 0:
+            os.makedirs(directory)
+        with open(os.path.join(directory, f"file-{i:05d}.ts"), 'w') as f:
+            f.write(f"// Generated source {i}\n" + f"export const value{i} = {i};\n" * 40)
+
+    remaining = asset_mb * 1024 * 1024
+    if remaining:
+        os.makedirs(os.path.join(path, "assets"))
+        chunk = os.urandom(ASSET_CHUNK_MB * 1024 * 1024)
+        i = 0
+        while remaining > 0:
+            with open(os.path.join(path, "assets", f"blob-{i:03d}.bin"), 'wb') as f:
+                f.write(chunk[:remaining])
+            remaining -= len(chunk)
+            i += 1
+
+
+def tree_size(path):
+    """(file count, total bytes) of a directory"""
+    count = total = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            count += 1
+            total += os.path.getsize(os.path.join(root, name))
+    return count, total
+
+
+def push(project_path, remote_path):
+    """Create the bare remote and push the initial commit to it; return seconds"""
+    subprocess.run(["git", "init", "-q", "--bare", remote_path], check=True)
+    start = time.perf_counter()
+    result = subprocess.run(["git", "push", "-q", "origin", "HEAD"], cwd=project_path,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"push failed: {result.stderr.strip()}")
+    return time.perf_counter() - start
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    import resource
+
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return usage / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def run_scenario(size, args):
+    """Benchmark one template size in this process and return its results"""
+    work_dir = tempfile.mkdtemp(prefix=f"bench-scaffold-{size}-", dir=args.work_dir)
+    try:
+        template_dir = os.path.join(work_dir, "template")
+        developer_dir = os.path.join(work_dir, "Developer")
+        remotes_dir = os.path.join(work_dir, "remotes")
+        os.makedirs(developer_dir)
+        make_template(template_dir, **SIZES[size])
+        files, template_bytes = tree_size(template_dir)
+        if args.packed:
+            build_pack(template_dir, template_dir + ".ptpl")
+            template_dir += ".ptpl"
+
+        # git@bench-remote:bench/NAME.git -> <remotes>/bench/NAME.git
+        os.environ.update({"GIT_CONFIG_COUNT": "1",
+                           "GIT_CONFIG_KEY_0": f"url.{remotes_dir}/.insteadOf",
+                           "GIT_CONFIG_VALUE_0": f"git@{REMOTE_HOST}:"})
+        accounts_file = os.path.join(work_dir, "git-accounts.json")
+        with open(accounts_file, 'w') as f:
+            json.dump({"bench": {"name": "bench", "email": "bench@example.com",
+                                 "ssh_host": REMOTE_HOST, "ssh_key": "~/.ssh/id_bench"}}, f)
+
+        registry = open_registry(developer_dir, accounts_file)
+        scaffolder = ProjectScaffolder(registry.accounts(), developer_dir, template_dir,
+                                       materializer=TemplateMaterializer(parse_chain(args.copy_mode)),
+                                       git_backend=args.git_backend, registry=registry)
+        scaffolder.export_allowed_repos = False
+        scaffolder.tracer = Tracer(os.devnull)
+
+        start = time.perf_counter()
+        scaffolder.template_index()
+        index_seconds = time.perf_counter() - start
+
+        # Single projects, one after another, each pushed to its own bare remote
+        push_seconds = []
+        for i in range(args.projects):
+            name = f"single-{i}"
+            project_path = scaffolder.create_project(name, "bench")
+            if args.push:
+                push_seconds.append(push(project_path,
+                                         os.path.join(remotes_dir, "bench", f"{name}.git")))
+        single = summarize(scaffolder.tracer.traces)
+        if push_seconds:
+            push_seconds.sort()
+            single["push"] = {"count": len(push_seconds), "max": push_seconds[-1]}
+            single["push"].update((f"p{pct}", percentile(push_seconds, pct))
+                                  for pct in PERCENTILES)
+
+        # A batch on the worker pool
+        scaffolder.tracer.traces.clear()
+        entries = [{"name": f"batch-{i}", "account": "bench", "placeholders": {}}
+                   for i in range(args.batch)]
+        start = time.perf_counter()
+        results = run_batch(scaffolder, entries, args.workers)
+        batch_seconds = time.perf_counter() - start
+        failed = [r for r in results if r["status"] != "ok"]
+        if failed:
+            raise RuntimeError(f"batch failed: {failed[0]['error']}")
+
+        return {
+            "size": size,
+            "template": {"files": files, "bytes": template_bytes},
+            "index_seconds": round(index_seconds, 6),
+            "single": single,
+            "batch": {
+                "projects": args.batch,
+                "workers": args.workers or os.cpu_count(),
+                "seconds": round(batch_seconds, 6),
+                "projects_per_s": round(args.batch / batch_seconds, 2),
+                "mb_per_s": round(args.batch * template_bytes / 1e6 / batch_seconds, 2),
+                "stages": summarize(scaffolder.tracer.traces),
+            },
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_isolated(size, argv):
+    """Run one scenario in a fresh interpreter so its peak RSS is its own"""
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), "--scenario", size]
+                            + argv, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{size} scenario failed:\n{result.stderr}")
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def git_commit():
+    """Commit of the tree being measured, marked dirty when it has local changes"""
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=BENCH_DIR, capture_output=True,
+                              text=True).stdout.strip()
+    commit = git("rev-parse", "--short", "HEAD") or "unknown"
+    return commit + ("-dirty" if git("status", "--porcelain", "--untracked-files=no") else "")
+
+
+def print_results(scenarios):
+    """Human readable summary of all scenarios"""
+    for s in scenarios:
+        files, mb = s["template"]["files"], s["template"]["bytes"] / 1e6
+        batch = s["batch"]
+        print(f"\n== {s['size']}: {files} files, {mb:.1f} MB "
+              f"(index built in {s['index_seconds'] * 1000:.1f} ms)")
+        print(f"batch of {batch['projects']} on {batch['workers']} workers: "
+              f"{batch['projects_per_s']} projects/s, {batch['mb_per_s']} MB/s")
+        print(f"peak RSS {s['peak_rss_mb']} MB")
+        columns = [f"p{pct}" for pct in PERCENTILES] + ["max"]
+        print(f"{'single, ms':<12}" + "".join(f"{c:>10}" for c in columns))
+        for stage, entry in s["single"].items():
+            print(f"{stage:<12}" + "".join(f"{entry[c] * 1000:10.1f}" for c in columns))
+        git = s["single"].get("git", {})
+        if "objects_written" in git:
+            print(f"git objects per project: {git['objects_written'] / git['count']:.0f} written, "
+                  f"{git.get('objects_shared', 0) / git['count']:.0f} shared from the cache")
+
+
+def print_comparison(scenarios, baseline):
+    """Throughput and median latency against an earlier results file"""
+    previous = {s["size"]: s for s in baseline["scenarios"]}
+    print(f"\nCompared with {baseline['commit']} ({baseline['date']}):")
+    for s in scenarios:
+        old = previous.get(s["size"])
+        if old is None:
+            print(f"  {s['size']:<8} not in the earlier run")
+            continue
+        for label, new_value, old_value in (
+                ("projects/s", s["batch"]["projects_per_s"], old["batch"]["projects_per_s"]),
+                ("single p50 ms", s["single"]["total"]["p50"] * 1000,
+                 old["single"]["total"]["p50"] * 1000),
+                ("peak RSS MB", s["peak_rss_mb"], old["peak_rss_mb"])):
+            change = (new_value - old_value) / old_value * 100 if old_value else 0.0
+            print(f"  {s['size']:<8} {label:<14} {old_value:10.2f} -> {new_value:10.2f}"
+                  f"  ({change:+.1f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="minimal,medium",
+                        help=f"Comma separated template sizes: {', '.join(SIZES)}")
+    parser.add_argument("--projects", type=int, default=10,
+                        help="Single projects created one after another")
+    parser.add_argument("--batch", type=int, default=20, help="Projects in the batch run")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--git-backend", choices=GIT_BACKENDS, default="subprocess")
+    parser.add_argument("--copy-mode", default="auto")
+    parser.add_argument("--packed", action="store_true",
+                        help="Scaffold from a compiled (.ptpl) version of each template")
+    parser.add_argument("--no-push", dest="push", action="store_false",
+                        help="Skip pushing single projects to local bare remotes")
+    parser.add_argument("--work-dir", help="Parent directory for the temporary files")
+    parser.add_argument("--save", action="store_true",
+                        help=f"Save the results under {os.path.relpath(RESULTS_DIR)}")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--scenario", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.scenario:
+        print(json.dumps(run_scenario(args.scenario, args)))
+        return 0
+
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        parser.error(f"Unknown size(s): {', '.join(unknown)}")
+
+    scenario_args = ["--projects", str(args.projects), "--batch", str(args.batch),
+                     "--git-backend", args.git_backend, "--copy-mode", args.copy_mode]
+    if args.workers:
+        scenario_args += ["--workers", str(args.workers)]
+    if args.work_dir:
+        scenario_args += ["--work-dir", args.work_dir]
+    if not args.push:
+        scenario_args.append("--no-push")
+    if args.packed:
+        scenario_args.append("--packed")
+    scenarios = [run_isolated(size, scenario_args) for size in sizes]
+    print_results(scenarios)
+
+    results = {
+        "commit": git_commit(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": {k: v for k, v in vars(args).items() if k not in ("save", "compare", "scenario")},
+        "scenarios": scenarios,
+    }
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            print_comparison(scenarios, json.load(f))
+    if args.save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{results['commit']}.json")
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved {os.path.relpath(path)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
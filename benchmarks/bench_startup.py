@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+CLI Startup Benchmark
+Measures cold start of cli.py up to its first action (a dry-run create) and
+fails when it exceeds the budget or when tkinter gets imported
+
+The budget applies to the time spent above a bare interpreter start, so the
+result does not depend on how slow the machine's Python itself boots.
+
+Usage:
+    python3 benchmarks/bench_startup.py [--runs N] [--budget-ms 50]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+REPO_TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                             "templates", "project-template-minimal")
+
+
+def time_command(command, runs):
+    """Median wall time in milliseconds of a command started from scratch"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, default=50.0,
+                        help="Maximum median time to first action above interpreter start")
+    parser.add_argument("--template", default=REPO_TEMPLATE)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="bench-startup-") as work_dir:
+        # A copy, so nothing the CLI might write ends up in the checkout
+        template_dir = os.path.join(work_dir, os.path.basename(os.path.normpath(args.template)))
+        if os.path.isdir(args.template):
+            shutil.copytree(args.template, template_dir)
+        else:
+            shutil.copy2(args.template, template_dir)
+        accounts = os.path.join(work_dir, "git-accounts.json")
+        with open(accounts, 'w') as f:
+            json.dump({"bench": {"name": "bench", "email": "bench@example.com",
+                                 "ssh_host": "github-bench", "ssh_key": "~/.ssh/id_bench"}}, f)
+        cli = [sys.executable, os.path.join(APP_DIR, "cli.py"), "create", "startup-probe",
+               "--dry-run", "--accounts", accounts, "--developer-dir", work_dir,
+               "--template-dir", template_dir]
+
+        # Warm the bytecode and file system caches once
+        subprocess.run(cli, check=True, stdout=subprocess.DEVNULL)
+
+        interpreter = time_command([sys.executable, "-c", "pass"], args.runs)
+        first_action = time_command(cli, args.runs)
+
+        imports = subprocess.run([sys.executable, "-X", "importtime"] + cli[1:],
+                                 capture_output=True, text=True).stderr
+        overhead = first_action - interpreter
+        gui_imported = any(line.rstrip().endswith(("| tkinter", "| _tkinter"))
+                           for line in imports.splitlines())
+
+    print(f"interpreter start   {interpreter:8.1f} ms")
+    print(f"cli first action    {first_action:8.1f} ms")
+    print(f"cli overhead        {overhead:8.1f} ms  (budget {args.budget_ms:.0f} ms)")
+    print(f"tkinter imported    {'yes' if gui_imported else 'no'}")
+
+    if gui_imported or overhead > args.budget_ms:
+        print("FAIL")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())